@@ -0,0 +1,60 @@
+"""Add indexes for hot queries
+
+Revision ID: c9f3a6e2b8d4
+Revises: b4e8c2d91f37
+Create Date: 2026-10-17 19:41:07.552931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9f3a6e2b8d4'
+down_revision: Union[str, None] = 'b4e8c2d91f37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_indexes() -> None:
+    op.create_index(op.f('ix_bot_users_user_id'), 'bot_users', ['user_id'], unique=False,
+                    postgresql_concurrently=True)
+    op.create_index('ix_file_translations_user_id_status', 'file_translations', ['user_id', 'status'], unique=False,
+                    postgresql_concurrently=True)
+    op.create_index(op.f('ix_receipts_tracker_id'), 'receipts', ['tracker_id'], unique=False,
+                    postgresql_concurrently=True)
+    op.create_index('ix_transactions_from_user_id_amount', 'transactions', ['from_user_id', 'amount'], unique=False,
+                    postgresql_where=sa.text('from_user_id IS NOT NULL'),
+                    sqlite_where=sa.text('from_user_id IS NOT NULL'),
+                    postgresql_concurrently=True)
+    op.create_index('ix_transactions_to_user_id_amount', 'transactions', ['to_user_id', 'amount'], unique=False,
+                    postgresql_where=sa.text('to_user_id IS NOT NULL'),
+                    sqlite_where=sa.text('to_user_id IS NOT NULL'),
+                    postgresql_concurrently=True)
+
+
+def _drop_indexes() -> None:
+    op.drop_index('ix_transactions_to_user_id_amount', table_name='transactions', postgresql_concurrently=True)
+    op.drop_index('ix_transactions_from_user_id_amount', table_name='transactions', postgresql_concurrently=True)
+    op.drop_index(op.f('ix_receipts_tracker_id'), table_name='receipts', postgresql_concurrently=True)
+    op.drop_index('ix_file_translations_user_id_status', table_name='file_translations', postgresql_concurrently=True)
+    op.drop_index(op.f('ix_bot_users_user_id'), table_name='bot_users', postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and keeps the tables writable while it builds
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            _create_indexes()
+    else:
+        _create_indexes()
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            _drop_indexes()
+    else:
+        _drop_indexes()
@@ -1,14 +1,19 @@
 import os
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI, Request, Response
 from telegram import Update
 from telegram.ext import Application
 from dotenv import load_dotenv
-from models.database import get_db
 from models.models import User
 from sqlalchemy.orm import Session
-from sqlalchemy.ext.asyncio import AsyncSession
 from bot_handler import setup_handlers
+from bot_handler.http_client import init_http_session, close_http_session
+from bot_handler.retry import get_circuit_breaker
+from bot_handler.rate_limiter import get_rate_limiter
+from bot_handler.dispatcher import UpdateDispatcher
+from bot_handler.job_queue import TranslationWorkerPool, TRANSLATION_WORKERS, collect_job_metrics
+from metrics import REGISTRY, CONTENT_TYPE, WEBHOOK_LATENCY
 from finance.routes import router as finance_router
 
 # Load environment variables
@@ -20,6 +25,12 @@ print(f"Loading .env from: {env_path}")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 MAIN_BOT = os.getenv("MAIN_BOT")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# Secret Telegram echoes in X-Telegram-Bot-Api-Secret-Token; unset skips the check
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Seconds to finish accepted updates on shutdown
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", 20))
+# Telegram does not report the secret, so set this once after rotating WEBHOOK_SECRET
+WEBHOOK_FORCE_SET = os.getenv("WEBHOOK_FORCE_SET", "false").lower() == "true"
 print(os.getenv("TELEGRAM_TOKEN"))
 print(os.getenv("WEBHOOK_URL"))
 # Telegram bot application
@@ -28,19 +39,43 @@ application = Application.builder().token(TELEGRAM_TOKEN).build()
 # Setup bot handlers
 setup_handlers(application)
 
+# Updates are acknowledged at once and handled in the background, in order per chat
+dispatcher = UpdateDispatcher(application)
+
+# Translation workers running inside the webhook process (0 when using worker.py instead)
+worker_pool = TranslationWorkerPool(application.bot, size=TRANSLATION_WORKERS)
+
+# Queue depth is read from the database on every scrape
+REGISTRY.add_collector(collect_job_metrics)
+
 # Setup logging with Telegram handler
 
+async def ensure_webhook():
+    """Register the webhook unless Telegram already points at it, so restarts and extra workers skip the call"""
+    url = f"{WEBHOOK_URL}/webhook"
+    info = await application.bot.get_webhook_info()
+    if info.url == url and not WEBHOOK_FORCE_SET:
+        return
+    await application.bot.set_webhook(url=url, secret_token=WEBHOOK_SECRET)
+    print(f"Webhook set to {url}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan events handler for FastAPI"""
     # Startup event
+    await init_http_session()
     await application.initialize()
-    await application.bot.set_webhook(url=f"{WEBHOOK_URL}/webhook")
+    await ensure_webhook()
+    worker_pool.start()
     
     yield
     
-    # Shutdown event
+    # Shutdown event: stop claiming jobs, finish accepted updates, then drain running jobs
+    worker_pool.stop_claiming()
+    await dispatcher.stop(timeout=WEBHOOK_DRAIN_TIMEOUT)
+    await worker_pool.drain()
     await application.shutdown()
+    await close_http_session()
 
 # FastAPI app
 app = FastAPI(lifespan=lifespan)
@@ -49,18 +84,44 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(finance_router)
 
 @app.post("/webhook")
-async def webhook(request: Request, db: AsyncSession = Depends(get_db)):
-    """Handle incoming webhook requests from Telegram"""
-    data = await request.json()
-    update = Update.de_json(data=data, bot=application.bot)
-    await application.process_update(update)
-    return {"ok": True}
+async def webhook(request: Request):
+    """Validate an update from Telegram, queue it and acknowledge at once"""
+    started = time.perf_counter()
+    try:
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return Response(status_code=403)
+        try:
+            data = await request.json()
+            update = Update.de_json(data=data, bot=application.bot)
+        except Exception:
+            return Response(status_code=400)
+        if update is None:
+            return Response(status_code=400)
+        if not dispatcher.submit(update):
+            # Backlogged or shutting down; Telegram delivers it again later
+            return Response(status_code=503)
+        return {"ok": True}
+    finally:
+        WEBHOOK_LATENCY.observe(time.perf_counter() - started)
 
 @app.get("/")
 async def root():
     """Root endpoint"""
     return {"status": "running"}
 
+@app.get("/status/dify")
+async def dify_status():
+    """Dify circuit breaker and rate limiter state for operators"""
+    return {
+        "circuit_breaker": get_circuit_breaker().snapshot(),
+        "rate_limiter": get_rate_limiter().snapshot(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics of this process"""
+    return Response(await REGISTRY.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, debug=True)
+    from serve import main
+    main()
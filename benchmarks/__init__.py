@@ -0,0 +1 @@
+"""Offline benchmarks for the translation engine; see benchmarks/run.py"""
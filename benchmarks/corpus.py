@@ -0,0 +1,61 @@
+"""
+Synthetic SRT corpora for benchmarks.
+
+Usage:
+    python -m benchmarks.corpus out.srt --cues 3000 --repetition 0.2
+
+``repetition`` is the share of cues that repeat an earlier cue's text, the
+way recurring lines ("Thank you.", a chorus) do in real subtitles.
+"""
+import random
+import datetime
+import argparse
+import srt
+
+WORDS = (
+    "the a you I we they it is was be have do go know see think want need come take "
+    "what where why how when right now here there again never always maybe just really "
+    "time night home way friend father mother money door car house world life day man "
+    "woman something nothing everything someone told said look wait listen please sorry"
+).split()
+
+
+def generate_srt(cues, repetition=0.1, seed=0, min_words=3, max_words=14):
+    """Return SRT text with ``cues`` cues, of which about ``repetition`` repeat an earlier text"""
+    rng = random.Random(seed)
+    texts = []
+    subtitles = []
+    start = datetime.timedelta(seconds=1)
+    for index in range(1, cues + 1):
+        if texts and rng.random() < repetition:
+            text = rng.choice(texts)
+        else:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+            sentence = " ".join(words).capitalize() + rng.choice(".?!")
+            # About a third of real cues span two lines
+            if len(words) > 7 and rng.random() < 0.35:
+                half = len(sentence) // 2
+                split_at = sentence.find(" ", half)
+                if split_at > 0:
+                    sentence = sentence[:split_at] + "\n" + sentence[split_at + 1:]
+            text = sentence
+            texts.append(text)
+        duration = datetime.timedelta(milliseconds=rng.randint(900, 4500))
+        subtitles.append(srt.Subtitle(index=index, start=start, end=start + duration, content=text))
+        start += duration + datetime.timedelta(milliseconds=rng.randint(100, 1500))
+    return srt.compose(subtitles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic SRT file")
+    parser.add_argument("output", help="SRT file to write")
+    parser.add_argument("--cues", type=int, default=1000)
+    parser.add_argument("--repetition", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(generate_srt(args.cues, args.repetition, args.seed))
+
+
+if __name__ == "__main__":
+    main()
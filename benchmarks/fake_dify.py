@@ -0,0 +1,170 @@
+"""
+Local stand-in for Dify's ``/chat-messages`` endpoint.
+
+Usage:
+    python -m benchmarks.fake_dify --port 8900 --latency lognormal:0.8,0.5 --error-rate 0.02
+
+Every segment of the query is "translated" by tagging it, so answers keep
+the batch's delimiters. Latency, server errors, throttling, delimiter
+corruption and streaming chunk pacing are configurable, and usage metadata
+is returned like Dify's so the translator's cost accounting works.
+"""
+import json
+import random
+import asyncio
+import argparse
+from aiohttp import web
+
+DELIMITER = "[DELIMITER]"
+PRICE_PER_TOKEN = 0.000002
+
+
+def parse_latency(spec):
+    """
+    Build a sampler of seconds from ``kind:params``.
+
+    Kinds: ``constant:s``, ``uniform:low,high``, ``exponential:mean`` and
+    ``lognormal:median,sigma``.
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "constant":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / values[0])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeDifyConfig:
+    def __init__(self, latency="lognormal:0.8,0.5", error_rate=0.0, throttle_rate=0.0,
+                 corruption_rate=0.0, chunk_chars=40, chunk_delay=0.01, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate  # Share of requests answered with a 500
+        self.throttle_rate = throttle_rate  # Share of requests answered with a 429
+        self.corruption_rate = corruption_rate  # Share of answers with one delimiter dropped
+        self.chunk_chars = chunk_chars  # Characters per streamed message event
+        self.chunk_delay = chunk_delay  # Seconds between streamed message events
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+class FakeDify:
+    """aiohttp application answering chat requests the way Dify does"""
+
+    def __init__(self, config: FakeDifyConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.sample_latency = parse_latency(config.latency)
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.corrupted = 0
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat-messages", self.chat_messages)
+        app.router.add_get("/v1/stats", self.stats)
+        return app
+
+    async def stats(self, request):
+        return web.json_response({
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "corrupted": self.corrupted,
+        })
+
+    def _answer(self, query):
+        segments = [f"<output>ترجمه {segment.strip()}</output>" for segment in query.split(DELIMITER)]
+        if len(segments) > 1 and self.rng.random() < self.config.corruption_rate:
+            self.corrupted += 1
+            merge_at = self.rng.randrange(len(segments) - 1)
+            segments[merge_at:merge_at + 2] = [segments[merge_at] + " " + segments[merge_at + 1]]
+        return f"\n{DELIMITER}\n".join(segments)
+
+    @staticmethod
+    def _usage(query, answer):
+        # Same rough estimate the translator uses: about four characters per token
+        prompt_tokens = len(query) // 4 + 1
+        completion_tokens = len(answer) // 4 + 1
+        total_tokens = prompt_tokens + completion_tokens
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": total_tokens, "total_price": f"{total_tokens * PRICE_PER_TOKEN:.7f}"}
+
+    async def chat_messages(self, request):
+        payload = await request.json()
+        self.requests += 1
+        await asyncio.sleep(self.sample_latency(self.rng))
+
+        roll = self.rng.random()
+        if roll < self.config.throttle_rate:
+            self.throttled += 1
+            return web.json_response({"message": "rate limited"}, status=429, headers={"Retry-After": "1"})
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            self.errors += 1
+            return web.json_response({"message": "internal error"}, status=500)
+
+        query = payload.get("query", "")
+        answer = self._answer(query)
+        usage = self._usage(query, answer)
+        if payload.get("response_mode") != "streaming":
+            return web.json_response({"answer": answer, "metadata": {"usage": usage}})
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for start in range(0, len(answer), self.config.chunk_chars):
+            chunk = answer[start:start + self.config.chunk_chars]
+            event = {"event": "message", "answer": chunk}
+            await response.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self.config.chunk_delay)
+        event = {"event": "message_end", "metadata": {"usage": usage}}
+        await response.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        await response.write_eof()
+        return response
+
+
+async def start_fake_dify(config: FakeDifyConfig, host="127.0.0.1", port=0):
+    """Start the server in the running loop; returns (runner, base_url)"""
+    runner = web.AppRunner(FakeDify(config).app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}/v1"
+
+
+def add_config_arguments(parser):
+    parser.add_argument("--latency", default="lognormal:0.8,0.5",
+                        help="latency distribution, e.g. constant:0.5, uniform:0.2,1, lognormal:0.8,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--corruption-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args):
+    return FakeDifyConfig(latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                          corruption_rate=args.corruption_rate, chunk_chars=args.chunk_chars,
+                          chunk_delay=args.chunk_delay, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Dify chat-messages server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    web.run_app(FakeDify(config_from_args(args)).app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
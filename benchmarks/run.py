@@ -0,0 +1,216 @@
+"""
+Benchmark ``SubtitleTranslator.translate_all_subtitles`` against a local fake Dify.
+
+Usage:
+    python -m benchmarks.run --cues 500,3000 --batch-sizes 10,30,60 --concurrency 1,4,8 \\
+        --latency lognormal:0.8,0.5 --output bench.json
+
+Every combination of corpus size, batch size, concurrency and response mode
+runs in a fresh process, so peak RSS is measured per run. Results are
+printed as a table and written as JSON for comparing releases.
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import datetime
+import itertools
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import aiohttp
+from .corpus import generate_srt
+from .fake_dify import start_fake_dify, add_config_arguments, config_from_args
+
+# The translator is imported through the bot package, which builds a database
+# engine and a Telegram error-log handler on import. Neither is used here.
+os.environ.setdefault("LOCAL_DB", "true")
+os.environ.pop("TELEGRAM_TOKEN", None)
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of ``values`` (0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(share * len(ordered)))
+    return ordered[rank - 1]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def _run_case(case):
+    from bot_handler.translator import SubtitleTranslator
+    from bot_handler.http_client import close_http_session
+
+    latencies = []
+
+    class TimedTranslator(SubtitleTranslator):
+        async def _translate_once(self, texts, usage=None, on_cue=None):
+            started = time.perf_counter()
+            try:
+                return await super()._translate_once(texts, usage, on_cue)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    content = generate_srt(case["cues"], case["repetition"], case["seed"])
+    translator = TimedTranslator("benchmark",
+                                 batch_size=case["batch_size"],
+                                 base_url=case["base_url"],
+                                 concurrency=case["concurrency"],
+                                 token_budget=case["token_budget"],
+                                 max_batch_chars=case["max_chars"],
+                                 response_mode=case["response_mode"])
+    subtitles = await translator.parse_srt_content(content)
+    started = time.perf_counter()
+    try:
+        await translator.translate_all_subtitles(subtitles)
+    finally:
+        await close_http_session()
+    wall_time = time.perf_counter() - started
+
+    return {
+        "wall_time": wall_time,
+        "cues_per_second": len(subtitles) / wall_time if wall_time else 0.0,
+        "requests": len(latencies),
+        "batches": translator.batch_count,
+        "mismatched_batches": translator.mismatched_batches,
+        "repaired_cues": translator.repaired_cues,
+        "duplicate_cues": translator.duplicate_cues,
+        "tokens": translator.total_tokens,
+        "cost": translator.total_price,
+        "peak_rss_mb": peak_rss_mb(),
+        "batch_latency_p50": percentile(latencies, 0.50),
+        "batch_latency_p95": percentile(latencies, 0.95),
+    }
+
+
+def run_case(case):
+    """Entry point of one benchmark process"""
+    return asyncio.run(_run_case(case))
+
+
+async def server_stats(base_url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/stats") as response:
+            return await response.json()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+async def benchmark(args):
+    config = config_from_args(args)
+    runner, base_url = await start_fake_dify(config)
+    loop = asyncio.get_running_loop()
+    results = []
+    # One process per case, so every run starts from a cold heap
+    context = multiprocessing.get_context("spawn")
+    try:
+        grid = itertools.product(int_list(args.cues), args.response_modes.split(","),
+                                 int_list(args.batch_sizes), int_list(args.concurrency), range(args.repeat))
+        for cues, response_mode, batch_size, concurrency, run in grid:
+            case = {
+                "cues": cues,
+                "repetition": args.repetition,
+                "seed": args.corpus_seed,
+                "response_mode": response_mode,
+                "batch_size": batch_size,
+                "concurrency": concurrency,
+                "token_budget": args.token_budget,
+                "max_chars": args.max_chars,
+                "run": run,
+                "base_url": base_url,
+            }
+            before = await server_stats(base_url)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                metrics = await loop.run_in_executor(pool, run_case, case)
+            after = await server_stats(base_url)
+            metrics["server"] = {key: after[key] - before[key] for key in after}
+            case.pop("base_url")
+            results.append({**case, **metrics})
+            print_row(results[-1])
+    finally:
+        await runner.cleanup()
+
+    return {
+        "meta": {
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fake_dify": config.to_dict(),
+            "dify_limits": {
+                "max_rps": os.environ["DIFY_MAX_RPS"],
+                "max_tpm": os.environ["DIFY_MAX_TPM"],
+                "max_concurrency": os.environ["DIFY_MAX_CONCURRENCY"],
+            },
+        },
+        "results": results,
+    }
+
+
+def print_header():
+    print(f"{'cues':>6} {'mode':>9} {'batch':>5} {'conc':>4} {'wall s':>8} {'cues/s':>8} {'reqs':>5} "
+          f"{'tokens':>8} {'rss MB':>7} {'p50 s':>6} {'p95 s':>6} {'mismatch':>8}")
+
+
+def print_row(row):
+    print(f"{row['cues']:>6} {row['response_mode']:>9} {row['batch_size']:>5} {row['concurrency']:>4} "
+          f"{row['wall_time']:>8.2f} {row['cues_per_second']:>8.1f} {row['requests']:>5} {row['tokens']:>8} "
+          f"{row['peak_rss_mb']:>7.1f} {row['batch_latency_p50']:>6.2f} {row['batch_latency_p95']:>6.2f} "
+          f"{row['mismatched_batches']:>8}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the translation engine against a fake Dify")
+    parser.add_argument("--cues", default="500,3000", help="comma separated corpus sizes")
+    parser.add_argument("--repetition", type=float, default=0.1, help="share of repeated cue texts")
+    parser.add_argument("--corpus-seed", type=int, default=0)
+    parser.add_argument("--batch-sizes", default="10,30,60", help="comma separated max cues per batch")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma separated batch concurrency")
+    parser.add_argument("--response-modes", default="blocking", help="blocking, streaming or both")
+    parser.add_argument("--token-budget", type=int, default=4000)
+    parser.add_argument("--max-chars", type=int, default=16000)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per combination")
+    parser.add_argument("--max-rps", type=float, default=1000, help="DIFY_MAX_RPS for the runs")
+    parser.add_argument("--max-tpm", type=float, default=10 ** 9, help="DIFY_MAX_TPM for the runs")
+    parser.add_argument("--max-dify-concurrency", type=int, default=64,
+                        help="DIFY_INITIAL_CONCURRENCY and DIFY_MAX_CONCURRENCY for the runs")
+    parser.add_argument("--output", default="benchmark-results.json")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    # Benchmark processes read the shared limiter's budgets from the environment
+    os.environ["DIFY_MAX_RPS"] = str(args.max_rps)
+    os.environ["DIFY_MAX_TPM"] = str(args.max_tpm)
+    os.environ["DIFY_INITIAL_CONCURRENCY"] = str(args.max_dify_concurrency)
+    os.environ["DIFY_MAX_CONCURRENCY"] = str(args.max_dify_concurrency)
+
+    print_header()
+    report = asyncio.run(benchmark(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import gzip
+import time
+import asyncio
+import hashlib
+import threading
+from logger_config import global_logger
+
+logger = global_logger
+
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "./artifacts")
+ARTIFACT_STORE_MAX_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_BYTES", 1024 * 1024 * 1024))
+# Minimum seconds between scans of ARTIFACT_DIR for eviction
+ARTIFACT_EVICT_INTERVAL = float(os.getenv("ARTIFACT_EVICT_INTERVAL", 60))
+
+
+class ArtifactStore:
+    """
+    Local, gzip-compressed, content-addressed store for uploaded and translated files.
+
+    Artifacts are keyed by the sha256 of their uncompressed bytes. When the
+    compressed size on disk exceeds ``max_bytes``, the least recently used
+    artifacts are evicted. The size is read from disk, since the webhook and
+    ``worker.py`` share the directory, at most once per ``evict_interval``
+    seconds. A missing artifact is not an error: callers fall back to Telegram.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR, max_bytes=ARTIFACT_STORE_MAX_BYTES, evict_interval=ARTIFACT_EVICT_INTERVAL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._last_evict = None
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], f"{digest}.gz")
+
+    def _scan(self):
+        """List (last_used, size, path) for every stored artifact"""
+        entries = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".gz"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        now = time.monotonic()
+        if self._last_evict is not None and now - self._last_evict < self.evict_interval:
+            return
+        self._last_evict = now
+        entries = self._scan()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                logger.debug(f"Evicted artifact {path}")
+            except FileNotFoundError:
+                pass
+            # Gone either way, possibly evicted by another process
+            total_bytes -= size
+
+    def put_sync(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                return digest
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._evict()
+        return digest
+
+    def get_sync(self, digest):
+        path = self._path(digest)
+        try:
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+            # Mark as recently used for eviction
+            os.utime(path, (time.time(), time.time()))
+            return data
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError) as e:
+            logger.error(f"Corrupt artifact {digest}: {str(e)}")
+            return None
+
+    async def put(self, data):
+        """Store bytes and return their digest"""
+        return await asyncio.to_thread(self.put_sync, bytes(data))
+
+    async def get(self, digest):
+        """Return stored bytes, or None if the artifact is missing"""
+        if not digest:
+            return None
+        return await asyncio.to_thread(self.get_sync, digest)
+
+
+_store: ArtifactStore = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    """Return the process-wide artifact store"""
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
@@ -0,0 +1,77 @@
+"""
+Replay a sample SRT file at several token budgets and report how each one performs.
+
+Usage:
+    python -m bot_handler.calibrate_batching sample.srt --budgets 500,1000,2000,4000
+
+Every budget translates the whole file through Dify (translation memory is
+bypassed), so the run costs real tokens. Use a short but representative sample.
+"""
+import os
+import time
+import asyncio
+import argparse
+from .translator import SubtitleTranslator
+from .http_client import close_http_session
+
+API_KEY = os.getenv("DIFY_API_KEY", "app-12345677")
+API_ENDPOINT = os.getenv("DIFY_API_ENDPOINT", "https://cloud.dify.ai/v1")
+
+
+async def calibrate(content, budgets, max_cues, max_chars, concurrency):
+    """Translate ``content`` once per budget and collect the results"""
+    report = []
+    for budget in budgets:
+        translator = SubtitleTranslator(API_KEY,
+                                        batch_size=max_cues,
+                                        base_url=API_ENDPOINT,
+                                        concurrency=concurrency,
+                                        token_budget=budget,
+                                        max_batch_chars=max_chars)
+        subtitles = await translator.parse_srt_content(content)
+        started = time.monotonic()
+        await translator.translate_all_subtitles(subtitles)
+        elapsed = time.monotonic() - started
+        report.append({
+            "budget": budget,
+            "batches": translator.batch_count,
+            "seconds": elapsed,
+            "cues_per_second": len(subtitles) / elapsed if elapsed else 0.0,
+            "tokens": translator.total_tokens,
+            "cost": translator.total_price,
+            "mismatch_rate": (translator.mismatched_batches / translator.batch_count * 100
+                              if translator.batch_count else 0.0),
+        })
+    return report
+
+
+def print_report(report):
+    print(f"{'budget':>8} {'batches':>8} {'seconds':>9} {'cues/s':>8} {'tokens':>9} {'cost $':>9} {'mismatch':>9}")
+    for row in report:
+        print(f"{row['budget']:>8} {row['batches']:>8} {row['seconds']:>9.1f} {row['cues_per_second']:>8.2f} "
+              f"{row['tokens']:>9} {row['cost']:>9.4f} {row['mismatch_rate']:>8.1f}%")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Calibrate the translation token budget on a sample SRT file")
+    parser.add_argument("srt_file", help="sample SRT file to replay")
+    parser.add_argument("--budgets", default="500,1000,2000,4000",
+                        help="comma separated token budgets to try")
+    parser.add_argument("--max-cues", type=int, default=int(os.getenv("TRANSLATION_MAX_BATCH_CUES", 30)))
+    parser.add_argument("--max-chars", type=int, default=int(os.getenv("TRANSLATION_MAX_BATCH_CHARS", 4000)))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("TRANSLATION_CONCURRENCY", 4)))
+    args = parser.parse_args()
+
+    with open(args.srt_file, encoding="utf-8", errors="ignore") as f:
+        content = f.read()
+    budgets = [int(budget) for budget in args.budgets.split(",") if budget.strip()]
+
+    try:
+        report = await calibrate(content, budgets, args.max_cues, args.max_chars, args.concurrency)
+    finally:
+        await close_http_session()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
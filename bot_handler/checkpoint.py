@@ -0,0 +1,58 @@
+from sqlalchemy import select, delete
+from models.database import async_session
+from models.models import TranslationCheckpoint
+from logger_config import global_logger
+
+logger = global_logger
+
+
+class JobCheckpoint:
+    """
+    Finished batches of one file translation, persisted as they complete.
+
+    A checkpoint that cannot be written only costs a retranslation after a
+    restart, so write errors are logged rather than raised.
+    """
+
+    def __init__(self, file_translation_id):
+        self.file_translation_id = file_translation_id
+
+    async def load(self):
+        """Return ({cue position: translation}, {"total_tokens", "total_price"}) saved so far"""
+        translations = {}
+        spent = {"total_tokens": 0, "total_price": 0.0}
+        async with async_session() as session:
+            result = await session.execute(
+                select(TranslationCheckpoint)
+                .filter(TranslationCheckpoint.file_translation_id == self.file_translation_id)
+                .order_by(TranslationCheckpoint.id)
+            )
+            for checkpoint in result.scalars():
+                translations.update({int(position): text for position, text in checkpoint.translations.items()})
+                spent["total_tokens"] += checkpoint.total_tokens or 0
+                spent["total_price"] += checkpoint.total_price or 0.0
+        return translations, spent
+
+    async def save(self, translations, spent=None):
+        """Persist one batch of {cue position: translation} and what it cost"""
+        spent = spent or {}
+        try:
+            async with async_session() as session:
+                session.add(TranslationCheckpoint(
+                    file_translation_id=self.file_translation_id,
+                    translations={str(position): text for position, text in translations.items()},
+                    total_tokens=spent.get("total_tokens", 0),
+                    total_price=spent.get("total_price", 0.0)
+                ))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error saving checkpoint for file {self.file_translation_id}: {str(e)}")
+
+    async def clear(self):
+        """Drop the checkpoint once the translation has been delivered"""
+        async with async_session() as session:
+            await session.execute(
+                delete(TranslationCheckpoint)
+                .where(TranslationCheckpoint.file_translation_id == self.file_translation_id)
+            )
+            await session.commit()
@@ -0,0 +1,103 @@
+import os
+import asyncio
+from collections import OrderedDict, deque
+from logger_config import global_logger
+from metrics import WEBHOOK_DUPLICATES, UPDATES_PENDING
+
+logger = global_logger
+
+# Updates handled at the same time across all chats
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", 64))
+# Accepted but unhandled updates; beyond this the webhook asks Telegram to retry later
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", 10000))
+# Recent update_ids remembered to drop Telegram's redeliveries
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", 10000))
+
+
+class UpdateDispatcher:
+    """
+    Process webhook updates in the background, in order within each chat.
+
+    ``submit`` only records the update and returns, so the webhook can
+    acknowledge Telegram at once. Each chat with pending updates has one
+    task that handles them one after another, while different chats run
+    concurrently up to ``max_concurrency``. Updates whose ``update_id`` was
+    seen recently are dropped, so redeliveries are not handled twice.
+    """
+
+    def __init__(self, application, max_concurrency=WEBHOOK_MAX_CONCURRENCY,
+                 max_pending=WEBHOOK_MAX_PENDING, dedup_size=WEBHOOK_DEDUP_SIZE):
+        self.application = application
+        self.max_pending = max_pending
+        self.dedup_size = dedup_size
+        self.pending = 0
+        self._seen = OrderedDict()
+        self._queues = {}
+        self._tasks = set()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._closed = False
+
+    def _is_duplicate(self, update_id):
+        if update_id in self._seen:
+            self._seen.move_to_end(update_id)
+            return True
+        self._seen[update_id] = None
+        if len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+        return False
+
+    @staticmethod
+    def _chat_key(update):
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        # Nothing to order against; handle it on its own
+        return ("update", update.update_id)
+
+    def submit(self, update):
+        """Queue an update; returns False when the dispatcher cannot take more"""
+        if self._closed or self.pending >= self.max_pending:
+            return False
+        if self._is_duplicate(update.update_id):
+            WEBHOOK_DUPLICATES.inc()
+            logger.info(f"Dropped duplicate update {update.update_id}")
+            return True
+
+        key = self._chat_key(update)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            task = asyncio.create_task(self._drain(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append(update)
+        self.pending += 1
+        UPDATES_PENDING.set(self.pending)
+        return True
+
+    async def _drain(self, key, queue):
+        try:
+            while queue:
+                update = queue[0]
+                async with self._semaphore:
+                    try:
+                        await self.application.process_update(update)
+                    except Exception as e:
+                        logger.error(f"Error processing update {update.update_id}: {str(e)}", exc_info=True)
+                queue.popleft()
+                self.pending -= 1
+                UPDATES_PENDING.set(self.pending)
+        finally:
+            self._queues.pop(key, None)
+
+    async def stop(self, timeout=None):
+        """Stop accepting updates and wait up to ``timeout`` seconds for pending ones"""
+        self._closed = True
+        if self._tasks:
+            _, unfinished = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                logger.warning(f"Abandoned updates of {len(unfinished)} chats on shutdown")
+                await asyncio.gather(*unfinished, return_exceptions=True)
@@ -1,14 +1,20 @@
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, Message
 from telegram.ext import ContextTypes
-from models.models import BotUser, User, FileTranslation, FileStatus, Transaction, get_user_balance, Invoice, InvoiceTransaction
+from models.models import BotUser, User, FileTranslation, FileStatus, Transaction, get_user_balance, Invoice, InvoiceTransaction, TranslationJob
 from .auth import authenticate_user
 from sqlalchemy import func, select
 from models.database import async_session
 from sqlalchemy.ext.asyncio import AsyncSession
 import os, re
 import asyncio
-from .translator import SubtitleTranslator, count_words_in_srt
+from .translator import SubtitleTranslator, count_words_in_srt, analyze_srt
+from .translation_memory import get_translation_memory
+from .artifact_store import get_artifact_store
+from .checkpoint import JobCheckpoint
+from .progress import get_progress_service
+from .scheduler import queue_estimate, as_utc
+from .ledger import StageTimer, save_ledger
 from io import BytesIO
 import time
 import uuid
@@ -16,7 +22,14 @@ import uuid
 API_KEY = os.getenv("DIFY_API_KEY", "app-12345677")
 API_ENDPOINT = os.getenv("DIFY_API_ENDPOINT", "https://cloud.dify.ai/v1")
 WEBHOOK_URL=os.getenv("WEBHOOK_URL")
-BATCH_SIZE = 10
+BATCH_SIZE = int(os.getenv("TRANSLATION_MAX_BATCH_CUES", 30))
+TRANSLATION_TOKEN_BUDGET = int(os.getenv("TRANSLATION_TOKEN_BUDGET", 1000))
+TRANSLATION_MAX_BATCH_CHARS = int(os.getenv("TRANSLATION_MAX_BATCH_CHARS", 4000))
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", 4))
+# Share of the normal price charged when a completed translation of the same file is reused (0 = free)
+TRANSLATION_REUSE_PRICE_FACTOR = float(os.getenv("TRANSLATION_REUSE_PRICE_FACTOR", 1))
+DIFY_RESPONSE_MODE = os.getenv("DIFY_RESPONSE_MODE", "blocking")
+DIFY_STREAM_IDLE_TIMEOUT = float(os.getenv("DIFY_STREAM_IDLE_TIMEOUT", 30))
 
 # Configure logging
 from logger_config import global_logger
@@ -90,13 +103,14 @@ async def srt_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, b
         new_file = await context.bot.get_file(file.file_id)
         downloaded_file = await new_file.download_as_bytearray()
         
-        # Convert bytes to string and split into lines
+        # Keep a local copy so the confirm step doesn't download it again
+        input_artifact = await get_artifact_store().put(downloaded_file)
+
+        # Convert bytes to string and analyze it in a single pass
         content = downloaded_file.decode('utf-8', errors='ignore')
-        lines = content.split('\n')
-        
-        # Count translatable lines
-        translatable_lines = count_translatable_lines(lines)
-        words_count = count_words_in_srt(content)
+        analysis = analyze_srt(content)
+        translatable_lines = analysis.cues
+        words_count = analysis.words
         if translatable_lines == 0:
             await update.message.reply_text("❌ هیچ متن قابل ترجمه‌ای در فایل یافت نشد")
             return
@@ -106,6 +120,17 @@ async def srt_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, b
         # price_toman = translatable_lines * price_unit
         price_unit = 15  # Toman per word
         price_toman = words_count * price_unit
+
+        # A completed translation of the same content is resent at the reuse price
+        content_hash = analysis.content_hash
+        async with async_session() as session:
+            reusable = await FileTranslation.find_reusable(
+                session,
+                content_hash=content_hash,
+                file_unique_id=file.file_unique_id
+            )
+        if reusable:
+            price_toman = price_toman * TRANSLATION_REUSE_PRICE_FACTOR
         price_thousand_toman = price_toman / 1000
         
         # Check if the user has enough balance
@@ -129,7 +154,11 @@ async def srt_file_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, b
                         total_lines=translatable_lines,
                         price_unit=price_unit,
                         file_name=file.file_name,
-                        message_id=update.message.message_id
+                        message_id=update.message.message_id,
+                        content_hash=content_hash,
+                        file_unique_id=file.file_unique_id,
+                        input_artifact=input_artifact,
+                        estimated_tokens=analysis.estimated_tokens
                     )
                     
                     # Create inline keyboard
@@ -183,7 +212,114 @@ def replace_lines_in_srt(original_lines: list[str], translations: list[tuple[int
     return new_lines
 
 
-async def process_translation(update: Update, context: ContextTypes.DEFAULT_TYPE, file_id: int):
+async def charge_translation(session: AsyncSession, file: FileTranslation, total_cost_toman: float):
+    """Deduct the translation cost from the user's balance and invoice it"""
+    total_cost_rial = total_cost_toman * 10  # Convert to Rials
+
+    # Create transaction to deduct balance
+    transaction = await Transaction.record(
+        session,
+        total_cost_rial,
+        from_user_id=file.user_id,
+        description=f"Translation cost for {file.file_name} - {file.total_lines} lines"
+    )
+
+    # Create invoice
+    invoice = Invoice(
+        user_id=file.user_id,
+        number=str(uuid.uuid4()),
+        description=f"Translation of {file.file_name}"
+    )
+    session.add(invoice)
+    await session.flush()
+
+    # Link transaction to invoice
+    invoice_transaction = InvoiceTransaction(
+        invoice_id=invoice.id,
+        transaction_id=transaction.id
+    )
+    session.add(invoice_transaction)
+
+
+async def serve_reused_translation(bot: Bot, chat_id: int, session: AsyncSession,
+                                   file: FileTranslation, reusable: FileTranslation):
+    """Send a stored translation of the same content instead of translating again"""
+    logger.info(f'Reusing translation {reusable.id} for file {file.id}')
+    # Bill the translated words, as a translated job is, so reuse only changes the price factor
+    output_content = await get_artifact_store().get(reusable.output_artifact)
+    if output_content is None:
+        tg_file = await bot.get_file(reusable.output_file_id)
+        output_content = await tg_file.download_as_bytearray()
+    output_words = count_words_in_srt(output_content.decode('utf-8'))
+    total_cost_toman = output_words * file.price_unit * TRANSLATION_REUSE_PRICE_FACTOR
+    if total_cost_toman > 0:
+        await charge_translation(session, file, total_cost_toman)
+
+    await bot.send_document(
+        chat_id=chat_id,
+        document=reusable.output_file_id,
+        caption=f"✅ ترجمه شما کامل شد!\n"
+                f"📝 تعداد کل خطوط ترجمه شده: {reusable.total_lines}\n"
+                f"💰 هزینه کلی: {total_cost_toman:,.0f} تومان\n",
+        reply_to_message_id=file.message_id
+    )
+
+    file.status = FileStatus.COMPLETED
+    file.output_file_id = reusable.output_file_id
+    file.total_lines = reusable.total_lines
+    file.total_token_used = 0
+    file.total_cost = 0
+    file.reused_from_id = reusable.id
+    file.output_artifact = reusable.output_artifact
+    await session.commit()
+
+
+async def send_queue_message(bot: Bot, session: AsyncSession, job: TranslationJob, chat_id: int, reply_to: int):
+    """Tell the user where a newly queued job stands; returns the message id"""
+    text = "🔄 شروع ترجمه..."
+    estimate = await queue_estimate(session, job.id)
+    if estimate:
+        position, eta = estimate
+        eta_minutes = int(eta // 60)
+        eta_seconds = int(eta % 60)
+        text += (f"\n📋 جایگاه در صف: {position}"
+                 f"\n⏱ زمان تقریبی تا پایان ترجمه: {eta_minutes} دقیقه و {eta_seconds:02d} ثانیه")
+    message = await bot.send_message(chat_id=chat_id, text=text, reply_to_message_id=reply_to)
+    return message.message_id
+
+
+async def start_progress_message(bot: Bot, chat_id: int, reply_to: int, message_id: int = None):
+    """Turn the queue message into the progress message, or send one if it is gone"""
+    if message_id:
+        try:
+            message = await bot.edit_message_text("🔄 شروع ترجمه...", chat_id=chat_id, message_id=message_id)
+            if isinstance(message, Message):
+                return message
+        except Exception as e:
+            logger.warning(f"Could not reuse queue message {message_id}: {str(e)}")
+    return await bot.send_message(chat_id=chat_id, text="🔄 شروع ترجمه...", reply_to_message_id=reply_to)
+
+
+async def mark_translation_failed(file_id: int):
+    """Mark a file FAILED unless it was already delivered"""
+    async with async_session() as session:
+        file = await session.get(FileTranslation, file_id)
+        if file and file.status != FileStatus.COMPLETED:
+            file.status = FileStatus.FAILED
+            await session.commit()
+
+
+async def process_translation(bot: Bot, chat_id: int, file_id: int, progress_message_id: int = None,
+                              translation_job_id: int = None):
+    """Translate a confirmed file and send the result to ``chat_id``
+
+    Runs inside a translation worker (see ``job_queue``), not in the update handler.
+    ``progress_message_id`` is the queue message sent when the job was queued.
+    Stage timings and the per-batch usage ledger are stored against
+    ``translation_job_id``.
+    """
+    timer = StageTimer()
+    progress_message = None
     try:
         async with async_session() as session:
             start_time = time.time()
@@ -191,43 +327,81 @@ async def process_translation(update: Update, context: ContextTypes.DEFAULT_TYPE
             if not file:
                 logger.error(f"File {file_id} not found")
                 return
+            job = await session.get(TranslationJob, translation_job_id) if translation_job_id else None
+            if job and job.started_at and job.created_at:
+                timer.add("queue_wait", (as_utc(job.started_at) - as_utc(job.created_at)).total_seconds())
             
-            # Get the file from Telegram
-            tg_file = await context.bot.get_file(file.input_file_id)
-            file_content = await tg_file.download_as_bytearray()
-            file_content = file_content.decode('utf-8')
+            # Read the upload locally, falling back to Telegram if it was evicted
+            with timer.stage("download"):
+                store = get_artifact_store()
+                file_content = await store.get(file.input_artifact)
+                if file_content is None:
+                    tg_file = await bot.get_file(file.input_file_id)
+                    file_content = await tg_file.download_as_bytearray()
+                    file.input_artifact = await store.put(file_content)
+                file_content = file_content.decode('utf-8')
+
+            # Serve a completed translation of the same content without calling Dify
+            reusable = await FileTranslation.find_reusable(
+                session,
+                content_hash=file.content_hash,
+                file_unique_id=file.file_unique_id,
+                exclude_id=file.id
+            )
+            if reusable:
+                if progress_message_id:
+                    try:
+                        await bot.delete_message(chat_id=chat_id, message_id=progress_message_id)
+                    except Exception as e:
+                        logger.warning(f"Could not delete queue message {progress_message_id}: {str(e)}")
+                await serve_reused_translation(bot, chat_id, session, file, reusable)
+                return
             
             # Send initial progress message
-            print(update.callback_query.message.message_id)
-            progress_message = await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text="🔄 شروع ترجمه...",
-                reply_to_message_id=file.message_id
-            )
+            progress_message = await start_progress_message(bot, chat_id, file.message_id, progress_message_id)
 
-            admin_message = await context.bot.send_message(
+            admin_message = await bot.send_message(
                 chat_id=95604679,
                 text=f"📁 New File has been added to queue\nName: {file.file_name}\nLines: {file.total_lines}",
             )
             
+            translator = None
             try:
+                checkpoint = JobCheckpoint(file.id)
                 translator = SubtitleTranslator(API_KEY,
-                                                base_url=API_ENDPOINT)
+                                                batch_size=BATCH_SIZE,
+                                                base_url=API_ENDPOINT,
+                                                concurrency=TRANSLATION_CONCURRENCY,
+                                                token_budget=TRANSLATION_TOKEN_BUDGET,
+                                                max_batch_chars=TRANSLATION_MAX_BATCH_CHARS,
+                                                response_mode=DIFY_RESPONSE_MODE,
+                                                stream_idle_timeout=DIFY_STREAM_IDLE_TIMEOUT,
+                                                job_id=file.id,
+                                                checkpoint=checkpoint,
+                                                user_id=file.user_id,
+                                                memory=get_translation_memory())
                 logger.info(f'Going to translate file {file.id} for user {file.user_id}')
                 # Parse SRT content
-                subtitles = await translator.parse_srt_content(file_content)
+                with timer.stage("parse"):
+                    subtitles = await translator.parse_srt_content(file_content)
                 
                 # Update status to PROCESSING
                 file.status = FileStatus.PROCESSING
                 await session.commit()
                 
-                # Progress callback
+                # Progress callback; the first report is where a resumed job starts from.
+                # Edits are handed to the progress service, which coalesces and rate-limits them
+                progress_service = get_progress_service()
+                resumed_from = None
+
                 async def progress_callback(progress):
+                    nonlocal resumed_from
                     try:
-                        if progress > 0:
+                        if resumed_from is None:
+                            resumed_from = progress
+                        if progress > resumed_from:
                             elapsed_time = time.time() - start_time
-                            total_estimated_time = elapsed_time * (100 / progress)
-                            remaining_time = total_estimated_time - elapsed_time
+                            remaining_time = elapsed_time * (100 - progress) / (progress - resumed_from)
                             
                             # Format remaining time
                             remaining_minutes = int(remaining_time // 60)
@@ -236,7 +410,8 @@ async def process_translation(update: Update, context: ContextTypes.DEFAULT_TYPE
                         else:
                             eta_text = "\nدر حال محاسبه زمان باقی مانده..."
 
-                        await progress_message.edit_text(
+                        progress_service.publish(
+                            progress_message,
                             f"🔄<b> در حال ترجمه کردن:</b>\n"
                             f"<code>[{'■' * int(progress / 10)}{'□' * (10 - int(progress / 10))}] "
                             f"{progress:.1f}% </code>"
@@ -247,44 +422,21 @@ async def process_translation(update: Update, context: ContextTypes.DEFAULT_TYPE
                         logger.error(f"Error updating progress: {str(e)}")
                 
                 # Translate content
-                translated_content = await translator.translate_all_subtitles(
-                    subtitles, 
-                    progress_callback=progress_callback
-                )
-                
-                translated_content = translator.compose_srt(translated_content)
+                with timer.stage("translate"):
+                    translated_content = await translator.translate_all_subtitles(
+                        subtitles, 
+                        progress_callback=progress_callback
+                    )
                 
                 # Calculate total cost in Tomans
                 total_cost_toman = translator.calculate_cost_toman(file.price_unit)
-                total_cost_rial = total_cost_toman * 10  # Convert to Rials
-                
-                # Create transaction to deduct balance
-                transaction = Transaction(
-                    from_user_id=file.user_id,
-                    amount=total_cost_rial,
-                    description=f"Translation cost for {file.file_name} - {file.total_lines} lines"
-                )
-                session.add(transaction)
-                await session.flush()
-                
-                # Create invoice
-                invoice = Invoice(
-                    user_id=file.user_id,
-                    number=str(uuid.uuid4()),
-                    description=f"Translation of {file.file_name}"
-                )
-                session.add(invoice)
-                await session.flush()
+                await charge_translation(session, file, total_cost_toman)
                 
-                # Link transaction to invoice
-                invoice_transaction = InvoiceTransaction(
-                    invoice_id=invoice.id,
-                    transaction_id=transaction.id
-                )
-                session.add(invoice_transaction)
-                
-                # Create output file
-                output = BytesIO(translated_content.encode('utf-8-sig'))
+                # Compose the output file straight into the upload buffer
+                with timer.stage("compose"):
+                    output = translator.write_srt(translated_content, BytesIO())
+                    file.output_artifact = await get_artifact_store().put(output.getbuffer())
+                output.seek(0)
                 output.name = f"translated_{file.file_name}" if file.file_name else f"translated_subtitle_{file.id}.srt"
                 
                 # Send the translated file
@@ -292,17 +444,18 @@ async def process_translation(update: Update, context: ContextTypes.DEFAULT_TYPE
                 total_minutes = int(total_time // 60)
                 total_seconds = int(total_time % 60)
                 
-                message = await context.bot.send_document(
-                    chat_id=update.effective_chat.id,
-                    document=output,
-                    caption=f"✅ ترجمه شما کامل شد!\n"
-                            f"📝 تعداد کل خطوط ترجمه شده: {translator.total_lines}\n"
-                            f"📝 تعداد کل خطوط فایل اصلی: {file.total_lines}\n"
-                            f"⏱ زمان کل: {total_minutes}:{total_seconds:02d}\n"
-                            f"💰 هزینه کلی: {total_cost_toman:,} تومان\n",
-                    reply_to_message_id=file.message_id,
-                    parse_mode='HTML'
-                )
+                with timer.stage("upload"):
+                    message = await bot.send_document(
+                        chat_id=chat_id,
+                        document=output,
+                        caption=f"✅ ترجمه شما کامل شد!\n"
+                                f"📝 تعداد کل خطوط ترجمه شده: {translator.total_lines}\n"
+                                f"📝 تعداد کل خطوط فایل اصلی: {file.total_lines}\n"
+                                f"⏱ زمان کل: {total_minutes}:{total_seconds:02d}\n"
+                                f"💰 هزینه کلی: {total_cost_toman:,} تومان\n",
+                        reply_to_message_id=file.message_id,
+                        parse_mode='HTML'
+                    )
                 
                 # Update file status and details
                 file.status = FileStatus.COMPLETED
@@ -310,21 +463,57 @@ async def process_translation(update: Update, context: ContextTypes.DEFAULT_TYPE
                 file.total_token_used = translator.total_tokens
                 file.total_cost = translator.total_price  # Store in cents
                 file.total_lines = translator.total_lines
+                file.cache_hits = translator.cache_hits
+                file.tokens_saved = translator.tokens_saved
+                file.duplicate_cues = translator.duplicate_cues
+                logger.info(f'Translation memory for file {file.id}: hit rate {translator.cache_hit_rate:.1f}%, '
+                            f'{translator.tokens_saved} tokens saved, dedup ratio {translator.dedup_ratio:.1f}%')
                 logger.info(f'Total price in toman: {translator.total_price * 90000}')
                 await session.commit()
-                
-                await progress_message.delete()
-                
+
+                # The file is delivered and charged; cleanup failures must not mark it FAILED
+                try:
+                    await checkpoint.clear()
+                except Exception as e:
+                    logger.error(f"Could not clear checkpoint of file {file.id}: {str(e)}")
+                await save_ledger(file.id, translation_job_id, translator.batch_ledger, timer)
+
+                progress_service.forget(progress_message)
+                try:
+                    await progress_message.delete()
+                except Exception as e:
+                    logger.warning(f"Could not delete progress message of file {file.id}: {str(e)}")
+
+            except asyncio.CancelledError:
+                # Shutdown or a lost lease; finished batches are checkpointed and the job is requeued
+                get_progress_service().forget(progress_message)
+                try:
+                    await progress_message.edit_text("⏸ ترجمه موقتا متوقف شد و به زودی از همین نقطه ادامه می‌یابد.")
+                except Exception as e:
+                    logger.warning(f"Could not mark translation of file {file.id} as paused: {str(e)}")
+                raise
             except Exception as e:
                 logger.error(f"Translation error: {str(e)}")
                 file.status = FileStatus.FAILED
                 await session.commit()
+                if translator:
+                    await save_ledger(file.id, translation_job_id, translator.batch_ledger, timer)
+                get_progress_service().forget(progress_message)
                 await progress_message.edit_text(f"❌ خطای داخلی: {str(e)}")
                 raise e
                 
     except Exception as e:
         logger.error(f"Process translation error: {str(e)}")
-        await progress_message.edit_text(f"❌ خطا!: {str(e)}")
+        # Failures before translation starts (download, reuse) leave the file unmarked and no progress message
+        try:
+            await mark_translation_failed(file_id)
+        except Exception as db_error:
+            logger.error(f"Could not mark file {file_id} as failed: {str(db_error)}")
+        if progress_message:
+            get_progress_service().forget(progress_message)
+            await progress_message.edit_text(f"❌ خطا!: {str(e)}")
+        else:
+            await bot.send_message(chat_id=chat_id, text=f"❌ خطا!: {str(e)}")
 
 @authenticate_user
 async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE, bot_user: BotUser = None):
@@ -371,14 +560,16 @@ async def button_callback_handler(update: Update, context: ContextTypes.DEFAULT_
                 elif action == "start_translation":
                     logger.info(f"Starting translation process for file {file_translation_id}")
                     await query.message.delete()
-                    # Start translation in background
-                    asyncio.create_task(
-                        process_translation(
-                            update=update,
-                            context=context,
-                            file_id=file_translation_id
-                        )
+                    # Queue the translation; a worker from job_queue picks it up
+                    job = await TranslationJob.enqueue(
+                        session,
+                        file_translation_id=file_translation_id,
+                        chat_id=update.effective_chat.id
                     )
+                    if job.progress_message_id is None:
+                        job.progress_message_id = await send_queue_message(
+                            context.bot, session, job, update.effective_chat.id, file_translation.message_id
+                        )
 
         except Exception as e:
             logger.error(f"Error in button_callback_handler: {str(e)}", exc_info=True)
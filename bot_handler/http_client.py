@@ -0,0 +1,63 @@
+import os
+import aiohttp
+from logger_config import global_logger
+
+logger = global_logger
+
+# Connection pool settings for the Dify API client
+DIFY_CONN_LIMIT = int(os.getenv("DIFY_CONN_LIMIT", 100))
+DIFY_CONN_LIMIT_PER_HOST = int(os.getenv("DIFY_CONN_LIMIT_PER_HOST", 32))
+DIFY_DNS_TTL = int(os.getenv("DIFY_DNS_TTL", 300))
+DIFY_KEEPALIVE_TIMEOUT = float(os.getenv("DIFY_KEEPALIVE_TIMEOUT", 60))
+
+# Timeouts in seconds
+DIFY_CONNECT_TIMEOUT = float(os.getenv("DIFY_CONNECT_TIMEOUT", 10))
+DIFY_READ_TIMEOUT = float(os.getenv("DIFY_READ_TIMEOUT", 120))
+DIFY_TOTAL_TIMEOUT = float(os.getenv("DIFY_TOTAL_TIMEOUT", 300))
+
+_session: aiohttp.ClientSession = None
+
+
+def _create_session() -> aiohttp.ClientSession:
+    """Build a pooled keep-alive session with DNS caching"""
+    connector = aiohttp.TCPConnector(
+        limit=DIFY_CONN_LIMIT,
+        limit_per_host=DIFY_CONN_LIMIT_PER_HOST,
+        ttl_dns_cache=DIFY_DNS_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=DIFY_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=DIFY_TOTAL_TIMEOUT,
+        connect=DIFY_CONNECT_TIMEOUT,
+        sock_read=DIFY_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def init_http_session() -> aiohttp.ClientSession:
+    """Create the shared HTTP session (called from the app lifespan)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+        logger.info(
+            f"HTTP session initialized: limit={DIFY_CONN_LIMIT}, "
+            f"limit_per_host={DIFY_CONN_LIMIT_PER_HOST}, dns_ttl={DIFY_DNS_TTL}s"
+        )
+    return _session
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared HTTP session, creating it lazily if needed"""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+async def close_http_session() -> None:
+    """Close the shared HTTP session and its pooled connections"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
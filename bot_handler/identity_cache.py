@@ -0,0 +1,108 @@
+import os
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+from models.models import BotUser
+from metrics import BOT_USER_CACHE
+
+BOT_USER_CACHE_SIZE = int(os.getenv("BOT_USER_CACHE_SIZE", 10000))
+# Seconds an identity is trusted before it is read again; bounds staleness across processes
+BOT_USER_CACHE_TTL = float(os.getenv("BOT_USER_CACHE_TTL", 300))
+
+
+class UserIdentity:
+    """Detached snapshot of the BotUser fields handlers read"""
+    __slots__ = ("id", "telegram_id", "user_id", "username", "first_name", "last_name", "is_active")
+
+    def __init__(self, id, telegram_id, user_id, username=None, first_name=None, last_name=None, is_active=True):
+        self.id = id
+        self.telegram_id = telegram_id
+        self.user_id = user_id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.is_active = is_active
+
+    @classmethod
+    def from_bot_user(cls, bot_user):
+        return cls(bot_user.id, bot_user.telegram_id, bot_user.user_id, bot_user.username,
+                   bot_user.first_name, bot_user.last_name, bot_user.is_active)
+
+
+class IdentityCache:
+    """
+    Bounded LRU of telegram_id to UserIdentity with a TTL.
+
+    Entries are only trusted for ``ttl`` seconds, so a change made by another
+    process shows up within that time. Changes made through the ORM in this
+    process invalidate the entry when they commit (see the session events
+    below); code that changes ``bot_users`` with a bulk UPDATE must call
+    ``invalidate`` itself.
+    """
+
+    def __init__(self, size=BOT_USER_CACHE_SIZE, ttl=BOT_USER_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._hits = BOT_USER_CACHE.labels("hit")
+        self._misses = BOT_USER_CACHE.labels("miss")
+
+    def get(self, telegram_id):
+        entry = self._entries.get(telegram_id)
+        if entry is not None:
+            identity, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(telegram_id)
+                self._hits.inc()
+                return identity
+            del self._entries[telegram_id]
+        self._misses.inc()
+        return None
+
+    def put(self, identity):
+        self._entries[identity.telegram_id] = (identity, time.monotonic() + self.ttl)
+        self._entries.move_to_end(identity.telegram_id)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, telegram_id):
+        self._entries.pop(telegram_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+_cache: IdentityCache = None
+
+
+def get_identity_cache() -> IdentityCache:
+    """Return the process-wide identity cache"""
+    global _cache
+    if _cache is None:
+        _cache = IdentityCache()
+    return _cache
+
+
+@event.listens_for(BotUser, "after_update")
+@event.listens_for(BotUser, "after_delete")
+def _track_changed_bot_user(mapper, connection, target):
+    """Remember changed bot users on their session; they are invalidated once it commits"""
+    session = Session.object_session(target)
+    if session is None:
+        return
+    history = attributes.get_history(target, "telegram_id")
+    changed = session.info.setdefault("changed_telegram_ids", set())
+    changed.update(telegram_id for telegram_id in (target.telegram_id, *history.deleted) if telegram_id is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_bot_users(session):
+    # Invalidating only after commit keeps a concurrent miss from caching the old row again
+    for telegram_id in session.info.pop("changed_telegram_ids", ()):
+        get_identity_cache().invalidate(telegram_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_bot_users(session):
+    session.info.pop("changed_telegram_ids", None)
@@ -0,0 +1,246 @@
+import os
+import socket
+import asyncio
+import datetime
+from sqlalchemy import select, update, func
+from models.database import async_session
+from models.models import TranslationJob, JobStatus, FileTranslation, FileStatus
+from logger_config import global_logger
+from metrics import TRANSLATION_JOBS, TRANSLATIONS_IN_PROGRESS, TRANSLATION_JOBS_FINISHED
+from .handlers import process_translation, mark_translation_failed
+from .scheduler import utcnow, runnable, jobs_query, running_jobs, count_per_user, order_jobs, SCHEDULER_LOOKAHEAD
+
+logger = global_logger
+
+TRANSLATION_WORKERS = int(os.getenv("TRANSLATION_WORKERS", 2))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 2))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Seconds running jobs get to finish on shutdown before they are checkpointed and requeued
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", 60))
+
+
+async def claim_job(owner: str):
+    """
+    Lease the next runnable job to ``owner``, in the scheduler's order.
+
+    Queued jobs and running jobs whose lease has expired (their worker died)
+    are runnable; ``scheduler.order_jobs`` ranks them and holds back users
+    at their running-job cap. On Postgres, candidate rows are locked with
+    ``FOR UPDATE SKIP LOCKED`` so concurrent workers never wait on each
+    other. SQLite has no row locks, so the claim is a conditional update on
+    ``lease_version``, and a worker that loses the race simply polls again.
+    """
+    now = utcnow()
+    async with async_session() as session:
+        async with session.begin():
+            query = jobs_query().filter(runnable(now)).order_by(TranslationJob.id).limit(SCHEDULER_LOOKAHEAD)
+            if session.bind.dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True, of=TranslationJob)
+            candidates = (await session.execute(query)).all()
+            running_per_user = count_per_user(await running_jobs(session, now))
+            ordered = order_jobs(candidates, running_per_user, now)
+            if not ordered:
+                return None
+            job = ordered[0][0]
+
+            if job.attempts >= JOB_MAX_ATTEMPTS:
+                # The job keeps killing its workers; stop handing it out
+                logger.error(f"Translation job {job.id} failed after {job.attempts} attempts")
+                job.status = JobStatus.FAILED
+                job.last_error = "Lease expired too many times"
+                file = await session.get(FileTranslation, job.file_translation_id)
+                if file:
+                    file.status = FileStatus.FAILED
+                return None
+
+            result = await session.execute(
+                update(TranslationJob)
+                .where(TranslationJob.id == job.id)
+                .where(TranslationJob.lease_version == job.lease_version)
+                .values(
+                    status=JobStatus.RUNNING,
+                    lease_owner=owner,
+                    lease_expires_at=now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+                    lease_version=job.lease_version + 1,
+                    attempts=job.attempts + 1,
+                    started_at=now
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                return None
+            logger.info(f"Job {job.id} (file {job.file_translation_id}) claimed by {owner}")
+            return job.id, job.file_translation_id, job.chat_id, job.progress_message_id
+
+
+async def _update_owned(job_id: int, owner: str, **values):
+    """Update a job only while ``owner`` still holds its lease"""
+    async with async_session() as session:
+        async with session.begin():
+            result = await session.execute(
+                update(TranslationJob)
+                .where(TranslationJob.id == job_id)
+                .where(TranslationJob.lease_owner == owner)
+                .where(TranslationJob.status == JobStatus.RUNNING)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            return result.rowcount == 1
+
+
+async def heartbeat(job_id: int, owner: str):
+    """Extend the lease; returns False if it was lost to another worker"""
+    return await _update_owned(
+        job_id, owner,
+        lease_expires_at=utcnow() + datetime.timedelta(seconds=JOB_LEASE_SECONDS)
+    )
+
+
+async def finish_job(job_id: int, owner: str, succeeded: bool, error: str = None):
+    await _update_owned(
+        job_id, owner,
+        status=JobStatus.DONE if succeeded else JobStatus.FAILED,
+        lease_owner=None,
+        lease_expires_at=None,
+        last_error=error
+    )
+
+
+async def release_job(job_id: int, owner: str):
+    """Hand a job back to the queue without counting the attempt (e.g. on shutdown)"""
+    await _update_owned(
+        job_id, owner,
+        status=JobStatus.QUEUED,
+        lease_owner=None,
+        lease_expires_at=None,
+        attempts=TranslationJob.attempts - 1
+    )
+
+
+async def collect_job_metrics():
+    """Refresh the queued and running job gauges from the database"""
+    async with async_session() as session:
+        result = await session.execute(
+            select(TranslationJob.status, func.count())
+            .filter(TranslationJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+            .group_by(TranslationJob.status)
+        )
+        counts = dict(result.all())
+    for status in (JobStatus.QUEUED, JobStatus.RUNNING):
+        TRANSLATION_JOBS.labels(status.value).set(counts.get(status, 0))
+
+
+class TranslationWorkerPool:
+    """
+    Run queued translation jobs with a fixed number of workers.
+
+    Each worker claims a job, keeps its lease alive with heartbeats while
+    ``process_translation`` runs, and records the outcome. If the process
+    dies, the leases expire and another worker picks the jobs up.
+
+    Shutdown has two steps, so callers can do other work in between:
+    ``stop_claiming`` makes workers stop taking jobs, and ``drain`` gives
+    running jobs until the deadline to finish, then cancels the rest and
+    puts them back in the queue. ``drain`` also stops claiming. Their finished batches are already checkpointed, so the next
+    worker resumes them instead of paying for them again.
+    """
+
+    def __init__(self, bot, size=TRANSLATION_WORKERS, poll_interval=JOB_POLL_INTERVAL):
+        self.bot = bot
+        self.size = size
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        for number in range(self.size):
+            self._tasks.append(asyncio.create_task(self._run(f"{self.worker_id}:{number}")))
+        logger.info(f"Started {self.size} translation workers on {self.worker_id}")
+
+    def stop_claiming(self):
+        """Let running jobs continue but claim no new ones"""
+        self._stopping.set()
+
+    async def drain(self, timeout=JOB_DRAIN_TIMEOUT):
+        """Wait up to ``timeout`` seconds for running jobs, then requeue the rest"""
+        self.stop_claiming()
+        if self._tasks:
+            _, unfinished = await asyncio.wait(self._tasks, timeout=timeout)
+            if unfinished:
+                logger.warning(f"Requeueing unfinished jobs of {len(unfinished)} workers on shutdown")
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _wait(self):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self, owner):
+        while not self._stopping.is_set():
+            try:
+                claimed = await claim_job(owner)
+            except Exception as e:
+                logger.error(f"Error claiming translation job: {str(e)}")
+                claimed = None
+            if claimed is None:
+                await self._wait()
+                continue
+            try:
+                if self._stopping.is_set():
+                    # Claimed while shutdown began; hand it straight back
+                    await release_job(claimed[0], owner)
+                    break
+                await self._execute(owner, *claimed)
+            except Exception as e:
+                # Nothing restarts a worker that exits; the job's lease expires and another worker retries it
+                logger.error(f"Translation worker {owner} failed on job {claimed[0]}: {str(e)}")
+
+    async def _execute(self, owner, job_id, file_id, chat_id, progress_message_id):
+        task = asyncio.create_task(process_translation(self.bot, chat_id, file_id, progress_message_id,
+                                                       translation_job_id=job_id))
+        TRANSLATIONS_IN_PROGRESS.inc()
+        task.add_done_callback(lambda _: TRANSLATIONS_IN_PROGRESS.dec())
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=JOB_LEASE_SECONDS / 3)
+                if done:
+                    break
+                try:
+                    lease_held = await heartbeat(job_id, owner)
+                except Exception as e:
+                    # Keep working; the lease only lapses if heartbeats fail for its whole duration
+                    logger.error(f"Heartbeat for job {job_id} failed: {str(e)}")
+                    continue
+                if not lease_held:
+                    logger.error(f"Lost lease on job {job_id}; stopping its translation")
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    return
+        except asyncio.CancelledError:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await release_job(job_id, owner)
+            logger.info(f"Job {job_id} released back to the queue")
+            raise
+
+        error = None
+        try:
+            task.result()
+        except asyncio.CancelledError:
+            # The translation cancelled itself rather than being stopped by this worker
+            error = "Translation was cancelled"
+            await mark_translation_failed(file_id)
+        except Exception as e:
+            error = str(e)
+        async with async_session() as session:
+            file = await session.get(FileTranslation, file_id)
+            succeeded = error is None and file is not None and file.status == FileStatus.COMPLETED
+        await finish_job(job_id, owner, succeeded, error)
+        TRANSLATION_JOBS_FINISHED.labels("done" if succeeded else "failed").inc()
+        logger.info(f"Job {job_id} finished: {'done' if succeeded else 'failed'}")
@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+from sqlalchemy import insert, update
+from models.database import async_session
+from models.models import TranslationBatch, TranslationJob
+from logger_config import global_logger
+
+logger = global_logger
+
+# Stages of a translation job, stored as ``<stage>_seconds`` on TranslationJob
+STAGES = ("queue_wait", "download", "parse", "translate", "compose", "upload", "ledger")
+
+
+class StageTimer:
+    """Wall-clock seconds spent in each stage of one translation job"""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+
+async def save_ledger(file_translation_id, job_id, batches, timer: StageTimer):
+    """
+    Store a job's per-batch usage and its stage timings.
+
+    The ledger is for analysis only, so a failed write is logged rather
+    than failing a translation that has already been delivered.
+    """
+    try:
+        async with async_session() as session:
+            async with session.begin():
+                with timer.stage("ledger"):
+                    if batches:
+                        await session.execute(insert(TranslationBatch), [
+                            dict(batch, file_translation_id=file_translation_id, job_id=job_id)
+                            for batch in batches
+                        ])
+                if job_id is not None:
+                    await session.execute(
+                        update(TranslationJob)
+                        .where(TranslationJob.id == job_id)
+                        .values(**{f"{stage}_seconds": round(timer.seconds[stage], 3)
+                                   for stage in STAGES if stage in timer.seconds})
+                    )
+    except Exception as e:
+        logger.error(f"Error saving ledger for file {file_translation_id}: {str(e)}")
@@ -0,0 +1,120 @@
+import os
+import time
+import asyncio
+from collections import deque
+from telegram.error import BadRequest, RetryAfter
+from logger_config import global_logger
+
+logger = global_logger
+
+# Minimum seconds between two edits of the same message
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", 3))
+# Minimum seconds between two edits in the same chat
+PROGRESS_CHAT_INTERVAL = float(os.getenv("PROGRESS_CHAT_INTERVAL", 1))
+# Maximum edits per second across all chats, kept below the Bot API's ~30 msg/s
+PROGRESS_GLOBAL_RATE = int(os.getenv("PROGRESS_GLOBAL_RATE", 20))
+PROGRESS_TICK = 0.25
+
+
+class ProgressService:
+    """
+    Coalesce progress-message edits from every job into rate-limited Bot API calls.
+
+    Jobs call ``publish`` with the latest text and never wait for Telegram.
+    Only the newest text per message is kept. Unchanged text is skipped, and
+    edits are spaced out per message, per chat and globally. Flood-wait
+    errors pause all edits for the time Telegram asks.
+    """
+
+    def __init__(self, edit_interval=PROGRESS_EDIT_INTERVAL, chat_interval=PROGRESS_CHAT_INTERVAL,
+                 global_rate=PROGRESS_GLOBAL_RATE):
+        self.edit_interval = edit_interval
+        self.chat_interval = chat_interval
+        self.global_rate = global_rate
+        self._pending = {}
+        self._last_text = {}
+        self._last_edit = {}
+        self._last_chat_edit = {}
+        self._recent_edits = deque()
+        self._paused_until = 0.0
+        self._task = None
+
+    @staticmethod
+    def _key(message):
+        return message.chat_id, message.message_id
+
+    def publish(self, message, text, parse_mode=None):
+        """Schedule ``message`` to show ``text``; returns immediately"""
+        key = self._key(message)
+        if self._last_text.get(key) == text:
+            self._pending.pop(key, None)
+            return
+        self._pending[key] = (message, text, parse_mode)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def forget(self, message):
+        """Drop pending edits for a message that is about to be replaced or deleted"""
+        key = self._key(message)
+        self._pending.pop(key, None)
+        self._last_text.pop(key, None)
+        self._last_edit.pop(key, None)
+        # Keep the chat's spacing only while another of its messages is still tracked
+        chat_id = key[0]
+        if not any(other[0] == chat_id for other in (*self._last_edit, *self._pending)):
+            self._last_chat_edit.pop(chat_id, None)
+
+    def _take_global_slot(self, now):
+        while self._recent_edits and now - self._recent_edits[0] >= 1:
+            self._recent_edits.popleft()
+        if len(self._recent_edits) >= self.global_rate:
+            return False
+        self._recent_edits.append(now)
+        return True
+
+    async def _run(self):
+        while self._pending:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            for key, (message, text, parse_mode) in list(self._pending.items()):
+                chat_id = key[0]
+                if now - self._last_edit.get(key, float("-inf")) < self.edit_interval:
+                    continue
+                if now - self._last_chat_edit.get(chat_id, float("-inf")) < self.chat_interval:
+                    continue
+                if not self._take_global_slot(now):
+                    break
+
+                del self._pending[key]
+                self._last_edit[key] = now
+                self._last_chat_edit[chat_id] = now
+                try:
+                    await message.edit_text(text, parse_mode=parse_mode)
+                    self._last_text[key] = text
+                except RetryAfter as e:
+                    retry_after = getattr(e.retry_after, "total_seconds", lambda: e.retry_after)()
+                    logger.warning(f"Progress edits paused for {retry_after}s by Telegram flood control")
+                    self._paused_until = time.monotonic() + retry_after
+                    self._pending.setdefault(key, (message, text, parse_mode))
+                    break
+                except BadRequest as e:
+                    if "not modified" not in str(e).lower():
+                        logger.error(f"Error updating progress: {str(e)}")
+                except Exception as e:
+                    logger.error(f"Error updating progress: {str(e)}")
+
+            await asyncio.sleep(PROGRESS_TICK)
+
+
+_service: ProgressService = None
+
+
+def get_progress_service() -> ProgressService:
+    """Return the process-wide progress service"""
+    global _service
+    if _service is None:
+        _service = ProgressService()
+    return _service
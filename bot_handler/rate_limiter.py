@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+from collections import defaultdict
+from logger_config import global_logger
+
+logger = global_logger
+
+# Provider budgets shared by every translation job in the process
+DIFY_MAX_RPS = float(os.getenv("DIFY_MAX_RPS", 5))
+DIFY_MAX_TPM = float(os.getenv("DIFY_MAX_TPM", 200000))
+
+# Adaptive (AIMD) limit on requests in flight
+DIFY_MIN_CONCURRENCY = int(os.getenv("DIFY_MIN_CONCURRENCY", 1))
+DIFY_INITIAL_CONCURRENCY = int(os.getenv("DIFY_INITIAL_CONCURRENCY", 8))
+DIFY_MAX_CONCURRENCY = int(os.getenv("DIFY_MAX_CONCURRENCY", 32))
+DIFY_TARGET_LATENCY = float(os.getenv("DIFY_TARGET_LATENCY", 30))
+# Minimum seconds between two multiplicative decreases
+DIFY_DECREASE_COOLDOWN = float(os.getenv("DIFY_DECREASE_COOLDOWN", 5))
+
+
+class TokenBucket:
+    """Refill ``rate`` units per second up to ``capacity``"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        """Seconds until ``amount`` units are available (0 if they are now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class DifyRateLimiter:
+    """
+    Process-wide limiter in front of every Dify request.
+
+    Requests must fit a requests/sec and a tokens/min budget. The number of
+    requests in flight is tuned AIMD-style: it grows by one per window of
+    fast successes and halves on throttling or slow responses.
+
+    Batches are scheduled by weighted fair queuing: each user with pending
+    work gets an equal weight, split between that user's jobs, and a free
+    slot goes to the waiting job that has received the least service per
+    unit of weight. A user translating a whole season therefore gets the
+    same share as a user with one short file.
+    """
+
+    def __init__(self, max_rps=DIFY_MAX_RPS, max_tpm=DIFY_MAX_TPM,
+                 min_concurrency=DIFY_MIN_CONCURRENCY, initial_concurrency=DIFY_INITIAL_CONCURRENCY,
+                 max_concurrency=DIFY_MAX_CONCURRENCY, target_latency=DIFY_TARGET_LATENCY,
+                 decrease_cooldown=DIFY_DECREASE_COOLDOWN):
+        self.requests = TokenBucket(max_rps, max(1.0, max_rps))
+        self.tokens = TokenBucket(max_tpm / 60, max_tpm)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(initial_concurrency)
+        self.target_latency = target_latency
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self.throttled = 0
+        self._job_in_flight = defaultdict(int)
+        self._job_demand = defaultdict(int)
+        self._job_user = {}
+        self._virtual_time = {}
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    def _weight(self, job_id):
+        """Share of one user's weight held by ``job_id``"""
+        user_id = self._job_user[job_id]
+        return 1 / sum(1 for job in self._job_demand if self._job_user[job] == user_id)
+
+    def _fair_share(self, job_id):
+        active_users = max(1, len({self._job_user[job] for job in self._job_demand}))
+        return max(1, int(int(self.limit) * self._weight(job_id) / active_users))
+
+    def _has_room(self, job_id):
+        return (self.in_flight < int(self.limit)
+                and self._job_in_flight[job_id] < self._fair_share(job_id))
+
+    def _can_start(self, job_id):
+        if not self._has_room(job_id):
+            return False
+        # Yield to a waiting job that is further behind its fair share
+        own_time = self._virtual_time[job_id]
+        return not any(
+            self._virtual_time[job] < own_time and self._has_room(job)
+            for job in self._job_demand
+            if job != job_id and self._job_demand[job] > self._job_in_flight[job]
+        )
+
+    async def acquire(self, job_id, estimated_tokens, user_id=None):
+        """Wait for a slot for one request of ``job_id`` costing about ``estimated_tokens``"""
+        async with self._condition:
+            if job_id not in self._job_demand:
+                # A newly active job starts level with the least served job, not at zero
+                self._job_user[job_id] = user_id if user_id is not None else ("job", job_id)
+                self._virtual_time[job_id] = min(self._virtual_time.values(), default=0.0)
+            self._job_demand[job_id] += 1
+            try:
+                while True:
+                    await self._condition.wait_for(lambda: self._can_start(job_id))
+                    delay = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                    if delay == 0:
+                        break
+                    # Budgets refill over time rather than on release, so poll for them
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._release_demand(job_id)
+                raise
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+            self.in_flight += 1
+            self._job_in_flight[job_id] += 1
+            self._virtual_time[job_id] += estimated_tokens / self._weight(job_id)
+
+    def _release_demand(self, job_id):
+        self._job_demand[job_id] -= 1
+        if self._job_demand[job_id] <= 0:
+            del self._job_demand[job_id]
+            self._job_in_flight.pop(job_id, None)
+            self._job_user.pop(job_id, None)
+            self._virtual_time.pop(job_id, None)
+
+    async def release(self, job_id, estimated_tokens, used_tokens=None, latency=None, throttled=False):
+        """Return a slot and adapt the limit to how the request went"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._job_in_flight[job_id] -= 1
+            self._release_demand(job_id)
+            if used_tokens is not None:
+                # Settle the estimate against what the request really cost
+                if used_tokens > estimated_tokens:
+                    self.tokens.take(used_tokens - estimated_tokens)
+                else:
+                    self.tokens.give_back(estimated_tokens - used_tokens)
+
+            if throttled or (latency is not None and latency > self.target_latency):
+                self.throttled += int(throttled)
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self._last_decrease = now
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    logger.warning(f"Dify concurrency limit decreased to {int(self.limit)} "
+                                   f"(throttled={throttled}, latency={latency})")
+            elif latency is not None:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def snapshot(self):
+        """Limiter state for operators"""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "active_jobs": len(self._job_demand),
+            "active_users": len(set(self._job_user.values())),
+            "throttled": self.throttled,
+            "requests_available": round(self.requests.level, 2),
+            "tokens_available": round(self.tokens.level),
+        }
+
+
+_limiter: DifyRateLimiter = None
+
+
+def get_rate_limiter() -> DifyRateLimiter:
+    """Return the process-wide Dify rate limiter"""
+    global _limiter
+    if _limiter is None:
+        _limiter = DifyRateLimiter()
+    return _limiter
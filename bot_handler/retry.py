@@ -0,0 +1,142 @@
+import os
+import time
+import random
+import asyncio
+import datetime
+from email.utils import parsedate_to_datetime
+from logger_config import global_logger
+
+logger = global_logger
+
+# Retry policy for Dify requests
+DIFY_RETRIES = int(os.getenv("DIFY_RETRIES", 3))
+DIFY_BACKOFF_BASE = float(os.getenv("DIFY_BACKOFF_BASE", 1))
+DIFY_BACKOFF_MAX = float(os.getenv("DIFY_BACKOFF_MAX", 30))
+
+# Circuit breaker shared by every translation job in the process
+DIFY_BREAKER_THRESHOLD = int(os.getenv("DIFY_BREAKER_THRESHOLD", 5))
+DIFY_BREAKER_RESET_TIMEOUT = float(os.getenv("DIFY_BREAKER_RESET_TIMEOUT", 30))
+
+
+class DifyAPIError(Exception):
+    """A failed Dify request, carrying what the retry policy needs to know"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        # Other 4xx errors mean the request itself is wrong; sending it again won't help
+        return self.status is None or self.status in (408, 429) or self.status >= 500
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None, base=DIFY_BACKOFF_BASE, cap=DIFY_BACKOFF_MAX):
+    """Exponential backoff with full jitter, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests to a failing service for a while.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    callers wait in ``acquire`` instead of spending their retries. Once
+    ``reset_timeout`` seconds have passed a single trial request is let
+    through; its outcome closes the breaker or opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=DIFY_BREAKER_THRESHOLD, reset_timeout=DIFY_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_in_flight = False
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.warning(f"Dify circuit breaker {self.state} -> {state}")
+            self.state = state
+
+    async def acquire(self):
+        """Wait until a request may be sent; returns True if it is the half-open trial"""
+        while True:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    continue
+                self._set_state(self.HALF_OPEN)
+            if not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            await asyncio.sleep(1)
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+        self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def release(self):
+        """Give up a trial slot without an outcome (e.g. the caller was cancelled)"""
+        self._trial_in_flight = False
+
+    def snapshot(self):
+        """Breaker state for operators"""
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "times_opened": self.times_opened,
+            "retry_in": retry_in,
+        }
+
+
+_breaker: CircuitBreaker = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the process-wide Dify circuit breaker"""
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker()
+    return _breaker
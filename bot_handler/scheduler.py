@@ -0,0 +1,178 @@
+import os
+import datetime
+from sqlalchemy import select, or_, and_
+from models.models import TranslationJob, JobStatus, FileTranslation
+
+# "fair" serves the users with the fewest running jobs first, then oldest first.
+# "sjf" serves the smallest estimated job first, aged so large jobs still run.
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "fair").lower()
+# Running jobs allowed per user; 0 disables the cap
+MAX_JOBS_PER_USER = int(os.getenv("MAX_JOBS_PER_USER", 1))
+# In sjf mode, every second a job waits counts as this many tokens smaller
+SJF_AGING_TOKENS_PER_SECOND = float(os.getenv("SJF_AGING_TOKENS_PER_SECOND", 20))
+# Runnable jobs considered per claim
+SCHEDULER_LOOKAHEAD = int(os.getenv("SCHEDULER_LOOKAHEAD", 200))
+# Jobs translated in parallel across all workers, for queue ETAs
+SCHEDULER_WORKER_SLOTS = int(os.getenv("SCHEDULER_WORKER_SLOTS", os.getenv("TRANSLATION_WORKERS", 2)))
+# Throughput assumed until enough jobs have finished to measure it
+SCHEDULER_DEFAULT_TOKENS_PER_SECOND = float(os.getenv("SCHEDULER_DEFAULT_TOKENS_PER_SECOND", 40))
+# Token estimate per cue for files uploaded before estimates were stored
+TOKENS_PER_CUE = 15
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def as_utc(value):
+    """SQLite returns naive timestamps; they are stored in UTC"""
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def runnable(now):
+    """Queued jobs and running jobs whose lease has expired (their worker died)"""
+    return or_(
+        TranslationJob.status == JobStatus.QUEUED,
+        and_(TranslationJob.status == JobStatus.RUNNING, TranslationJob.lease_expires_at < now)
+    )
+
+
+def jobs_query():
+    """Jobs with the owner and size of their file: (job, user_id, estimated_tokens, total_lines)"""
+    return (
+        select(TranslationJob, FileTranslation.user_id, FileTranslation.estimated_tokens, FileTranslation.total_lines)
+        .join(FileTranslation, FileTranslation.id == TranslationJob.file_translation_id)
+    )
+
+
+def job_size(estimated_tokens, total_lines):
+    return estimated_tokens or (total_lines or 0) * TOKENS_PER_CUE
+
+
+async def running_jobs(session, now):
+    """Rows of jobs currently held by a live worker"""
+    result = await session.execute(
+        jobs_query()
+        .filter(TranslationJob.status == JobStatus.RUNNING)
+        .filter(TranslationJob.lease_expires_at >= now)
+    )
+    return result.all()
+
+
+def count_per_user(rows):
+    counts = {}
+    for _, user_id, _, _ in rows:
+        counts[user_id] = counts.get(user_id, 0) + 1
+    return counts
+
+
+def _priority(job, user_id, size, running_per_user, now, mode):
+    if job.status == JobStatus.RUNNING:
+        # An abandoned job already made its user wait; resume it first
+        return (0, 0, job.id)
+    if mode == "sjf":
+        created_at = as_utc(job.created_at) or now
+        waited = max(0.0, (now - created_at).total_seconds())
+        return (1, size - waited * SJF_AGING_TOKENS_PER_SECOND, job.id)
+    return (1, running_per_user.get(user_id, 0), job.id)
+
+
+def order_jobs(rows, running_per_user, now, mode=SCHEDULER_MODE, max_per_user=MAX_JOBS_PER_USER):
+    """
+    Runnable job rows in the order workers should claim them.
+
+    Queued jobs of users already at ``max_per_user`` running jobs are left
+    out; they become eligible when one of those jobs finishes.
+    """
+    ordered = []
+    for job, user_id, estimated_tokens, total_lines in rows:
+        if (job.status == JobStatus.QUEUED and max_per_user
+                and running_per_user.get(user_id, 0) >= max_per_user):
+            continue
+        size = job_size(estimated_tokens, total_lines)
+        ordered.append((_priority(job, user_id, size, running_per_user, now, mode),
+                        (job, user_id, estimated_tokens, total_lines)))
+    ordered.sort(key=lambda item: item[0])
+    return [row for _, row in ordered]
+
+
+def claim_order(rows, running_per_user, now, mode=SCHEDULER_MODE):
+    """Order in which successive claims would take the rows, each claim counting as running"""
+    running_per_user = dict(running_per_user)
+    remaining = list(rows)
+    ordered = []
+    while remaining:
+        row = order_jobs(remaining, running_per_user, now, mode, max_per_user=0)[0]
+        remaining.remove(row)
+        ordered.append(row)
+        running_per_user[row[1]] = running_per_user.get(row[1], 0) + 1
+    return ordered
+
+
+async def observed_tokens_per_second(session, sample=20):
+    """Estimated tokens translated per second by one job, over recently finished jobs"""
+    result = await session.execute(
+        jobs_query()
+        .filter(TranslationJob.status == JobStatus.DONE)
+        .filter(TranslationJob.started_at.isnot(None))
+        .order_by(TranslationJob.id.desc())
+        .limit(sample)
+    )
+    tokens = 0
+    seconds = 0.0
+    for job, _, estimated_tokens, total_lines in result.all():
+        started_at, finished_at = as_utc(job.started_at), as_utc(job.updated_at)
+        if finished_at is None or finished_at <= started_at:
+            continue
+        tokens += job_size(estimated_tokens, total_lines)
+        seconds += (finished_at - started_at).total_seconds()
+    if tokens == 0 or seconds == 0:
+        return SCHEDULER_DEFAULT_TOKENS_PER_SECOND
+    return tokens / seconds
+
+
+async def queue_estimate(session, job_id):
+    """
+    Return (position, eta_seconds) of a queued job, or None if it is not queued.
+
+    The position follows the scheduler's order. The ETA covers the work
+    ahead of the job, spread over the worker slots, plus the job itself.
+    The per-user cap limits how many of the user's own jobs overlap, so
+    those are spread over the cap instead.
+    """
+    now = utcnow()
+    running = await running_jobs(session, now)
+    result = await session.execute(jobs_query().filter(runnable(now)))
+    ordered = claim_order(result.all(), count_per_user(running), now)
+    rate = await observed_tokens_per_second(session)
+
+    own = None
+    ahead_tokens = 0.0
+    for position, row in enumerate(ordered, start=1):
+        if row[0].id == job_id:
+            own = position, row
+            break
+    if own is None:
+        return None
+    position, (_, user_id, estimated_tokens, total_lines) = own
+
+    user_ahead_tokens = 0.0
+    for job, job_user_id, job_estimated, job_lines in running:
+        elapsed = (now - (as_utc(job.started_at) or now)).total_seconds()
+        remaining = max(0.0, job_size(job_estimated, job_lines) - elapsed * rate)
+        ahead_tokens += remaining
+        if job_user_id == user_id:
+            user_ahead_tokens += remaining
+    for _, job_user_id, job_estimated, job_lines in ordered[:position - 1]:
+        ahead_tokens += job_size(job_estimated, job_lines)
+        if job_user_id == user_id:
+            user_ahead_tokens += job_size(job_estimated, job_lines)
+
+    slots = max(1, SCHEDULER_WORKER_SLOTS)
+    # Work ahead only delays this job once every slot is busy
+    shared_wait = ahead_tokens / (rate * slots) if len(running) + position > slots else 0.0
+    user_wait = user_ahead_tokens / (rate * MAX_JOBS_PER_USER) if MAX_JOBS_PER_USER else 0.0
+    eta = max(shared_wait, user_wait) + job_size(estimated_tokens, total_lines) / rate
+    return position, eta
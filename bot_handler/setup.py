@@ -1,4 +1,7 @@
+import time
+from functools import wraps
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
+from metrics import HANDLER_LATENCY
 from .handlers import (
     start_handler, 
     message_handler, 
@@ -8,23 +11,37 @@ from .handlers import (
     balance_handler
 )
 
+def timed(callback):
+    """Record how long a handler takes under its function name"""
+    latency = HANDLER_LATENCY.labels(callback.__name__)
+
+    @wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            latency.observe(time.perf_counter() - started)
+    return wrapper
+
+
 def setup_handlers(application: Application) -> None:
     """Register all bot handlers"""
     # Add command handlers
-    application.add_handler(CommandHandler("start", start_handler))
-    application.add_handler(CommandHandler("stats", stats_handler))
-    application.add_handler(CommandHandler("balance", balance_handler))
+    application.add_handler(CommandHandler("start", timed(start_handler)))
+    application.add_handler(CommandHandler("stats", timed(stats_handler)))
+    application.add_handler(CommandHandler("balance", timed(balance_handler)))
     
     # Add file handler for .srt files
     application.add_handler(MessageHandler(
         filters.Document.FileExtension("srt"), 
-        srt_file_handler
+        timed(srt_file_handler)
     ))
     
     # Add callback handler for inline buttons
-    application.add_handler(CallbackQueryHandler(button_callback_handler))
+    application.add_handler(CallbackQueryHandler(timed(button_callback_handler)))
     
     # Add general message handler
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, timed(message_handler)))
 
     # Add more handlers here as needed
@@ -0,0 +1,148 @@
+import os
+import hashlib
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from models.database import async_session
+from models.models import TranslationMemory
+from .translator import normalize_text
+from logger_config import global_logger
+
+logger = global_logger
+
+TRANSLATION_MEMORY_ENABLED = os.getenv("TRANSLATION_MEMORY_ENABLED", "true").lower() == "true"
+TRANSLATION_MEMORY_LRU_SIZE = int(os.getenv("TRANSLATION_MEMORY_LRU_SIZE", 50000))
+# Bump the model version whenever the Dify app, model or prompt changes so stale entries are not reused
+TRANSLATION_MODEL_VERSION = os.getenv("TRANSLATION_MODEL_VERSION", "v1")
+TRANSLATION_TARGET_LANGUAGE = os.getenv("TRANSLATION_TARGET_LANGUAGE", "fa")
+
+# Keep IN (...) lists well below driver parameter limits
+LOOKUP_CHUNK_SIZE = 500
+
+def hash_text(normalized_text):
+    """Hash normalized text into the translation memory key"""
+    return hashlib.sha256(normalized_text.encode('utf-8')).hexdigest()
+
+
+class MemoryEntry:
+    __slots__ = ("translated_text", "token_count")
+
+    def __init__(self, translated_text, token_count=0):
+        self.translated_text = translated_text
+        self.token_count = token_count or 0
+
+
+class TranslationMemoryStore:
+    """Database-backed translation memory with an in-process LRU in front of it"""
+
+    def __init__(self, target_language=TRANSLATION_TARGET_LANGUAGE, model_version=TRANSLATION_MODEL_VERSION,
+                 lru_size=TRANSLATION_MEMORY_LRU_SIZE):
+        self.target_language = target_language
+        self.model_version = model_version
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+
+    def _remember(self, source_hash, entry):
+        self._lru[source_hash] = entry
+        self._lru.move_to_end(source_hash)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    async def lookup(self, texts):
+        """Return {position: MemoryEntry} for every text already in the memory"""
+        hashes = [hash_text(normalize_text(text)) for text in texts]
+        found = {}
+        missing = set()
+        for source_hash in hashes:
+            entry = self._lru.get(source_hash)
+            if entry is not None:
+                self._lru.move_to_end(source_hash)
+                found[source_hash] = entry
+            else:
+                missing.add(source_hash)
+
+        if missing:
+            try:
+                missing = list(missing)
+                async with async_session() as session:
+                    for i in range(0, len(missing), LOOKUP_CHUNK_SIZE):
+                        result = await session.execute(
+                            select(TranslationMemory.source_hash,
+                                   TranslationMemory.translated_text,
+                                   TranslationMemory.token_count)
+                            .filter(TranslationMemory.source_hash.in_(missing[i:i + LOOKUP_CHUNK_SIZE]))
+                            .filter(TranslationMemory.target_language == self.target_language)
+                            .filter(TranslationMemory.model_version == self.model_version)
+                        )
+                        for source_hash, translated_text, token_count in result:
+                            entry = MemoryEntry(translated_text, token_count)
+                            self._remember(source_hash, entry)
+                            found[source_hash] = entry
+            except Exception as e:
+                logger.error(f"Translation memory lookup failed: {str(e)}")
+
+        return {
+            position: found[source_hash]
+            for position, source_hash in enumerate(hashes)
+            if source_hash in found
+        }
+
+    async def store(self, items):
+        """Persist (source_text, translated_text, token_count) tuples, skipping known entries"""
+        entries = {}
+        for source_text, translated_text, token_count in items:
+            normalized = normalize_text(source_text)
+            translated_text = translated_text.strip()
+            if not normalized or not translated_text:
+                continue
+            entries[hash_text(normalized)] = (normalized, translated_text, token_count)
+        if not entries:
+            return
+
+        for source_hash, (_, translated_text, token_count) in entries.items():
+            self._remember(source_hash, MemoryEntry(translated_text, token_count))
+
+        try:
+            async with async_session() as session:
+                hashes = list(entries)
+                existing = set()
+                for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+                    result = await session.execute(
+                        select(TranslationMemory.source_hash)
+                        .filter(TranslationMemory.source_hash.in_(hashes[i:i + LOOKUP_CHUNK_SIZE]))
+                        .filter(TranslationMemory.target_language == self.target_language)
+                        .filter(TranslationMemory.model_version == self.model_version)
+                    )
+                    existing.update(result.scalars())
+
+                session.add_all([
+                    TranslationMemory(
+                        source_hash=source_hash,
+                        target_language=self.target_language,
+                        model_version=self.model_version,
+                        source_text=normalized,
+                        translated_text=translated_text,
+                        token_count=token_count
+                    )
+                    for source_hash, (normalized, translated_text, token_count) in entries.items()
+                    if source_hash not in existing
+                ])
+                await session.commit()
+        except IntegrityError:
+            # Another job stored the same cues concurrently; theirs are as good as ours
+            logger.debug("Translation memory entries already stored by another job")
+        except Exception as e:
+            logger.error(f"Translation memory store failed: {str(e)}")
+
+
+_memory: TranslationMemoryStore = None
+
+
+def get_translation_memory():
+    """Return the process-wide translation memory, or None when it is disabled"""
+    global _memory
+    if not TRANSLATION_MEMORY_ENABLED:
+        return None
+    if _memory is None:
+        _memory = TranslationMemoryStore()
+    return _memory
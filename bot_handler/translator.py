@@ -1,4 +1,7 @@
 import re
+import time
+import codecs
+import hashlib
 import asyncio
 import aiohttp
 import datetime
@@ -6,9 +9,22 @@ import srt
 import logging
 import json
 from logger_config import global_logger
+from metrics import (DIFY_BATCH_LATENCY, DIFY_REQUESTS, DIFY_REQUEST_RETRIES, DIFY_BATCH_FAILURES,
+                     DIFY_TOKENS, DIFY_COST)
+from .http_client import get_http_session, DIFY_CONNECT_TIMEOUT
+from .rate_limiter import get_rate_limiter
+from .retry import DifyAPIError, DIFY_RETRIES, backoff_delay, get_circuit_breaker, parse_retry_after
 
 logger = global_logger
 
+WHITESPACE = re.compile(r'\s+')
+WORDS = re.compile(r'\w+')
+
+DIFY_OK = DIFY_REQUESTS.labels("ok")
+DIFY_THROTTLED = DIFY_REQUESTS.labels("throttled")
+DIFY_FAILED = DIFY_REQUESTS.labels("error")
+DIFY_REJECTED = DIFY_REQUESTS.labels("rejected")
+
 
 def count_words_in_srt(srt_content):
     """
@@ -21,36 +37,150 @@ def count_words_in_srt(srt_content):
         int: Number of words in the SRT file
     """
     try:
+        # Parse the SRT content lazily and count words cue by cue
+        return sum(len(WORDS.findall(subtitle.content)) for subtitle in srt.parse(srt_content))
         
-       
-        # Parse the SRT content
-        subtitles = list(srt.parse(srt_content))
-        
-        # Combine all subtitle content and count words
-        all_text = ' '.join(subtitle.content for subtitle in subtitles)
-        words = re.findall(r'\w+', all_text)
-        return len(words)
-        
-    except FileNotFoundError:
-        logger.error(f"Error: File '{srt_file_path}' not found.")
-        return -1
     except srt.SRTParseError as e:
-        logger.error(f"Error: Invalid SRT file format in '{srt_file_path}' {e}")
+        logger.error(f"Error: Invalid SRT file format {e}")
         return -1
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return -1
 
+def normalize_text(text):
+    """Normalize cue text so trivially different copies are treated as one"""
+    text = text.replace('\u202b', '').replace('\u202c', '')
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def estimate_tokens(text):
+    """
+    Cheaply estimate the number of tokens in a text without a tokenizer.
+
+    Latin text averages about four characters per token; other scripts are
+    counted as one token per character, which errs on the safe side.
+    """
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def pack_batches(texts, token_budget, max_cues, max_chars, delimiter='[DELIMITER]'):
+    """
+    Group consecutive texts into batches that fit a token budget.
+
+    Args:
+        texts (list[str]): texts to translate, in order
+        token_budget (int): target estimated tokens per batch
+        max_cues (int): maximum number of texts per batch
+        max_chars (int): maximum number of characters per batch
+
+    Returns:
+        list[list[int]]: positions into ``texts`` for each batch. A single text
+        larger than the limits gets a batch of its own.
+    """
+    separator_tokens = estimate_tokens(f"\n{delimiter}\n")
+    separator_chars = len(delimiter) + 2
+    batches = []
+    batch, batch_tokens, batch_chars = [], 0, 0
+    for position, text in enumerate(texts):
+        tokens = estimate_tokens(text) + separator_tokens
+        chars = len(text) + separator_chars
+        if batch and (len(batch) >= max_cues
+                      or batch_tokens + tokens > token_budget
+                      or batch_chars + chars > max_chars):
+            batches.append(batch)
+            batch, batch_tokens, batch_chars = [], 0, 0
+        batch.append(position)
+        batch_tokens += tokens
+        batch_chars += chars
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class SrtAnalysis:
+    __slots__ = ("cues", "words", "estimated_tokens", "content_hash")
+
+    def __init__(self, cues=0, words=0, estimated_tokens=0, content_hash=None):
+        self.cues = cues
+        self.words = words
+        self.estimated_tokens = estimated_tokens
+        self.content_hash = content_hash
+
+
+def analyze_srt(srt_content):
+    """
+    Scan SRT content once for everything needed to quote and deduplicate a job.
+
+    Cues are parsed lazily, so the file is never held as a list of subtitles.
+    The content hash covers cue timings and normalized text, which ignores
+    differences in numbering, line endings, BOMs and stray whitespace.
+
+    Args:
+        srt_content (str): srt content
+
+    Returns:
+        SrtAnalysis: cue count, word count, estimated tokens and content hash.
+        Content that is not valid SRT has no cues.
+    """
+    srt_content = srt_content.lstrip('\ufeff')
+    analysis = SrtAnalysis()
+    hasher = hashlib.sha256()
+    try:
+        for subtitle in srt.parse(srt_content):
+            text = normalize_text(subtitle.content)
+            if not text:
+                continue
+            analysis.cues += 1
+            analysis.words += len(WORDS.findall(subtitle.content))
+            analysis.estimated_tokens += estimate_tokens(text)
+            hasher.update(f"{srt.timedelta_to_srt_timestamp(subtitle.start)} --> "
+                          f"{srt.timedelta_to_srt_timestamp(subtitle.end)}\n{text}\n\n".encode('utf-8'))
+    except srt.SRTParseError as e:
+        logger.error(f"Error: Invalid SRT content {e}")
+        analysis = SrtAnalysis()
+        hasher = hashlib.sha256(srt_content.replace('\r\n', '\n').strip().encode('utf-8'))
+    analysis.content_hash = hasher.hexdigest()
+    return analysis
+
+
+def hash_srt_content(srt_content):
+    """Hash SRT content so re-encoded copies of the same subtitles match"""
+    return analyze_srt(srt_content).content_hash
+
+
 class SubtitleTranslator:
-    def __init__(self, api_key, batch_size=10, base_url='https://cloud.dify.ai/v1'):
+    def __init__(self, api_key, batch_size=30, base_url='https://cloud.dify.ai/v1', concurrency=1,
+                 session=None, memory=None, token_budget=1000, max_batch_chars=4000,
+                 response_mode='blocking', stream_idle_timeout=30, job_id=None, checkpoint=None,
+                 user_id=None):
         self.api_key = api_key
+        self.checkpoint = checkpoint
+        self.job_id = job_id if job_id is not None else id(self)  # Fair-share key in the rate limiter
+        self.user_id = user_id  # Jobs of one user share one weight in the rate limiter
+        self.session = session
+        self.memory = memory
         self.base_url = base_url
-        self.batch_size = batch_size
+        self.batch_size = batch_size  # Maximum cues per batch
+        self.token_budget = token_budget
+        self.max_batch_chars = max_batch_chars
+        self.concurrency = concurrency
+        self.response_mode = response_mode  # 'blocking' or 'streaming'
+        self.stream_idle_timeout = stream_idle_timeout
+        self.batch_latency = DIFY_BATCH_LATENCY.labels(response_mode)
         self.delimiter = '[DELIMITER]'
         self.total_price = 0
         self.total_lines = 0
         self.total_words = 0
         self.total_tokens = 0
+        self.cache_hits = 0
+        self.tokens_saved = 0
+        self.batch_count = 0
+        self.mismatched_batches = 0
+        self.repaired_cues = 0
+        self.duplicate_cues = 0
+        self.resumed_cues = 0
+        self.batch_ledger = []  # One row per translate_batch call, see _record_batch
         
     def calculate_cost_toman(self, unit_price):
         """Calculate cost in Toman"""
@@ -64,95 +194,410 @@ class SubtitleTranslator:
             logger.error(f"Error parsing SRT content: {str(e)}")
             raise
 
-    async def translate_batch(self, texts, retries=3):
-        """Translate a batch of subtitle texts"""
-        try:
-            logger.debug(f"Translating batch of {len(texts)} subtitles")
-            
-            # Join texts with delimiter
-            query = f"\n{self.delimiter}\n".join(texts)
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "inputs": {},
-                "query": query,
-                "response_mode": "blocking",
-                "conversation_id": "",
-                "user": "MotarjemAI",
-                "files": []
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat-messages",
-                    headers=headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"API request failed with status {response.status}: {error_text}")
-                        raise Exception(f"API request failed with status {response.status}")
-                    
-                    data = await response.json()
-                    if "answer" not in data:
-                        logger.error(f"Invalid API response: {data}")
-                        raise Exception("Invalid API response")
-                    
-                    # Get translations
-                    translations = data["answer"].split(f"{self.delimiter}")
-                    translations = [t.strip().replace('<output>', '').replace('</output>', '') for t in translations]
-                    
-                    # Update total price
-                    if "metadata" in data and "usage" in data["metadata"]:
-                        self.total_price += float(data["metadata"]["usage"]["total_price"])
-                        self.total_tokens += int(data["metadata"]["usage"]["total_tokens"])
-                        logger.debug(f"Batch translation completed. Total cost so far: ${self.total_price:.4f}")
-                    
-                    return translations
+    @property
+    def cache_hit_rate(self):
+        """Share of cues served from translation memory, as a percentage"""
+        if not self.total_lines:
+            return 0.0
+        return self.cache_hits / self.total_lines * 100
 
-        except Exception as e:
-            logger.error(f"Error in translation batch: {str(e)}, retries={retries}")
-            if retries == 0:
-                return ["" for _ in texts]
-            return await self.translate_batch(texts, retries=retries - 1)
+    async def _request_blocking(self, session, headers, payload):
+        """Send a blocking chat request and return (answer, usage)"""
+        async with session.post(
+            f"{self.base_url}/chat-messages",
+            headers=headers,
+            json=payload
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"API request failed with status {response.status}: {error_text}")
+                raise DifyAPIError(f"API request failed with status {response.status}",
+                                   status=response.status,
+                                   retry_after=parse_retry_after(response.headers.get("Retry-After")))
+
+            data = await response.json()
+            if "answer" not in data:
+                logger.error(f"Invalid API response: {data}")
+                raise DifyAPIError("Invalid API response")
+
+            return data["answer"], data.get("metadata", {}).get("usage")
+
+    async def _request_streaming(self, session, headers, payload, on_cue=None):
+        """Send a streaming chat request and return (answer, usage)
+
+        Server-sent events are read as they arrive and ``on_cue`` is awaited
+        each time another delimiter completes a cue. A stream that stays
+        silent for ``self.stream_idle_timeout`` seconds is abandoned.
+        """
+        timeout = aiohttp.ClientTimeout(total=None, connect=DIFY_CONNECT_TIMEOUT,
+                                        sock_read=self.stream_idle_timeout)
+        async with session.post(
+            f"{self.base_url}/chat-messages",
+            headers=headers,
+            json=payload,
+            timeout=timeout
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"API request failed with status {response.status}: {error_text}")
+                raise DifyAPIError(f"API request failed with status {response.status}",
+                                   status=response.status,
+                                   retry_after=parse_retry_after(response.headers.get("Retry-After")))
+
+            answer = ""
+            usage = None
+            finished_cues = 0
+            async for line in response.content:
+                line = line.decode('utf-8').strip()
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[len("data:"):])
+                event = data.get("event")
+                if event in ("message", "agent_message"):
+                    answer += data.get("answer", "")
+                    cues = answer.count(self.delimiter)
+                    if on_cue:
+                        for _ in range(cues - finished_cues):
+                            await on_cue()
+                    finished_cues = cues
+                elif event == "message_end":
+                    usage = data.get("metadata", {}).get("usage")
+                    break
+                elif event == "error":
+                    logger.error(f"API stream error: {data}")
+                    raise DifyAPIError(f"API stream error: {data.get('message')}", status=data.get("status"))
+            else:
+                raise DifyAPIError("API stream ended before message_end")
+
+            return answer, usage
+
+    @property
+    def dedup_ratio(self):
+        """Share of cues that reused the translation of an identical cue, as a percentage"""
+        if not self.total_lines:
+            return 0.0
+        return self.duplicate_cues / self.total_lines * 100
+
+    async def translate_batch(self, texts, retries=DIFY_RETRIES, usage=None, on_cue=None):
+        """Translate a batch of subtitle texts
+
+        Failed requests are retried up to ``retries`` times with jittered
+        exponential backoff, honoring ``Retry-After``. Every attempt first
+        waits for the shared circuit breaker, so jobs pause while Dify is
+        down instead of burning their retries, and then for a slot from the
+        shared rate limiter.
+
+        When ``usage`` is a dict, the tokens spent on the successful request
+        are stored under ``usage["total_tokens"]``. In streaming mode
+        ``on_cue`` is awaited whenever a cue of the batch is complete. Every
+        call adds one row to ``self.batch_ledger``.
+        """
+        breaker = get_circuit_breaker()
+        limiter = get_rate_limiter()
+        # Budget for the prompt and a translation of similar length
+        estimated_tokens = 2 * sum(estimate_tokens(text) for text in texts)
+        for attempt in range(retries + 1):
+            trial = await breaker.acquire()
+            attempt_usage = {}
+            latency = None
+            request_latency = None
+            throttled = False
+            try:
+                await limiter.acquire(self.job_id, estimated_tokens, user_id=self.user_id)
+            except BaseException:
+                # Cancelled or failed while queued for the limiter; a held trial would block every caller
+                if trial:
+                    breaker.release()
+                raise
+            started = time.monotonic()
+            try:
+                translations = await self._translate_once(texts, attempt_usage, on_cue)
+                latency = time.monotonic() - started
+                self.batch_latency.observe(latency)
+                DIFY_OK.inc()
+                breaker.record_success()
+                if usage is not None:
+                    usage.update(attempt_usage)
+                self._record_batch(len(texts), attempt, latency, attempt_usage)
+                return translations
+            except asyncio.CancelledError:
+                if trial:
+                    breaker.release()
+                raise
+            except Exception as e:
+                throttled = isinstance(e, DifyAPIError) and e.status == 429
+                request_latency = time.monotonic() - started
+                self.batch_latency.observe(request_latency)
+                logger.error(f"Error in translation batch: {str(e)}, retries={retries - attempt}")
+                if isinstance(e, DifyAPIError) and not e.retryable:
+                    # The service answered; the request itself is at fault
+                    DIFY_REJECTED.inc()
+                    DIFY_BATCH_FAILURES.inc()
+                    breaker.record_success()
+                    self._record_batch(len(texts), attempt, request_latency, failed=True)
+                    return ["" for _ in texts]
+                (DIFY_THROTTLED if throttled else DIFY_FAILED).inc()
+                breaker.record_failure()
+                retry_after = getattr(e, "retry_after", None)
+            finally:
+                await limiter.release(self.job_id, estimated_tokens,
+                                      used_tokens=attempt_usage.get("total_tokens"),
+                                      latency=latency, throttled=throttled)
+            if attempt < retries:
+                DIFY_REQUEST_RETRIES.inc()
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+        DIFY_BATCH_FAILURES.inc()
+        self._record_batch(len(texts), retries, request_latency, failed=True)
+        return ["" for _ in texts]
+
+    def _record_batch(self, cues, retries, latency, usage=None, failed=False):
+        """Add a batch's outcome to the ledger that ``process_translation`` stores"""
+        usage = usage or {}
+        self.batch_ledger.append({
+            "cues": cues,
+            "input_tokens": usage.get("prompt_tokens"),
+            "output_tokens": usage.get("completion_tokens"),
+            "total_tokens": usage.get("total_tokens"),
+            "price": usage.get("total_price"),
+            "latency": round(latency, 3) if latency is not None else None,
+            "retries": retries,
+            "failed": failed,
+        })
+
+    async def _translate_once(self, texts, usage=None, on_cue=None):
+        """Send one translation request for a batch and split the answer"""
+        logger.debug(f"Translating batch of {len(texts)} subtitles")
+        
+        # Join texts with delimiter
+        query = f"\n{self.delimiter}\n".join(texts)
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "inputs": {},
+            "query": query,
+            "response_mode": self.response_mode,
+            "conversation_id": "",
+            "user": "MotarjemAI",
+            "files": []
+        }
+        
+        session = self.session or get_http_session()
+        if self.response_mode == "streaming":
+            answer, usage_data = await self._request_streaming(session, headers, payload, on_cue)
+        else:
+            answer, usage_data = await self._request_blocking(session, headers, payload)
+
+        # Get translations
+        translations = answer.split(f"{self.delimiter}")
+        translations = [t.strip().replace('<output>', '').replace('</output>', '') for t in translations]
+
+        # Update total price
+        if usage_data:
+            self.total_price += float(usage_data["total_price"])
+            self.total_tokens += int(usage_data["total_tokens"])
+            DIFY_COST.inc(float(usage_data["total_price"]))
+            DIFY_TOKENS.inc(int(usage_data["total_tokens"]))
+            if usage is not None:
+                usage["total_tokens"] = int(usage_data["total_tokens"])
+                usage["total_price"] = float(usage_data["total_price"])
+                if usage_data.get("prompt_tokens") is not None:
+                    usage["prompt_tokens"] = int(usage_data["prompt_tokens"])
+                if usage_data.get("completion_tokens") is not None:
+                    usage["completion_tokens"] = int(usage_data["completion_tokens"])
+            logger.debug(f"Batch translation completed. Total cost so far: ${self.total_price:.4f}")
+
+        return translations
+
+    async def translate_aligned(self, texts, on_cue=None, spent=None, top_level=True):
+        """Translate texts, splitting the batch until every cue gets its own translation
+
+        When the API returns a different number of segments than were sent,
+        the batch is halved and each half is retranslated on its own, so only
+        the part that actually misaligns is paid for again. When ``spent`` is
+        a dict, the tokens and price of every request made are added to it.
+        Only batches in ``batch_count`` (``top_level``) count as mismatched,
+        so the mismatch rate stays a share of those batches.
+
+        Returns:
+            tuple[list[str], list[int]]: translations aligned with ``texts`` and
+            the estimated tokens spent on each of them
+        """
+        usage = {}
+        results = await self.translate_batch(texts, usage=usage, on_cue=on_cue)
+        if spent is not None:
+            spent["total_tokens"] = spent.get("total_tokens", 0) + usage.get("total_tokens", 0)
+            spent["total_price"] = spent.get("total_price", 0.0) + usage.get("total_price", 0.0)
+        if len(results) != len(texts):
+            if top_level:
+                self.mismatched_batches += 1
+            logger.warning(f"Batch returned {len(results)} translations for {len(texts)} cues")
+            if len(texts) > 1:
+                middle = len(texts) // 2
+                left, left_tokens = await self.translate_aligned(texts[:middle], spent=spent, top_level=False)
+                right, right_tokens = await self.translate_aligned(texts[middle:], spent=spent, top_level=False)
+                return left + right, left_tokens + right_tokens
+            # A single cue can only belong to itself, even if the model split it
+            results = [" ".join(result for result in results if result)]
+
+        # Split the batch's tokens over its cues by length to estimate per-cue cost
+        batch_tokens = usage.get("total_tokens", 0)
+        total_length = sum(len(text) for text in texts) or 1
+        return results, [round(batch_tokens * len(text) / total_length) for text in texts]
 
     async def translate_all_subtitles(self, subtitles, progress_callback=None):
-        """Translate all subtitles with progress updates"""
+        """Translate all subtitles with progress updates
+
+        Cues already in the translation memory are taken from it, identical
+        cues are collapsed into one unit, and only the remaining unique
+        misses are sent to the API, packed into batches by estimated token
+        count. Up to ``self.concurrency`` batches are in flight at once.
+        Results are put back in cue order. Progress is reported per cue, as
+        streamed cues or whole batches finish. Cues that still come back empty
+        are retranslated once in a repair pass after the main one.
+
+        With a ``checkpoint``, every finished batch is persisted as it
+        completes, and cues finished by an earlier run of the same job are
+        restored instead of being translated again.
+        """
+        texts = [subtitle.content.replace('\u202b', '') for subtitle in subtitles]
+        translations = [None] * len(texts)
+
+        if self.checkpoint:
+            restored, spent = await self.checkpoint.load()
+            for position, translation in restored.items():
+                if position < len(translations):
+                    translations[position] = translation
+            self.resumed_cues = len(restored)
+            self.total_tokens += spent.get("total_tokens", 0)
+            self.total_price += spent.get("total_price", 0.0)
+            if restored:
+                logger.info(f"Resuming from checkpoint: {self.resumed_cues}/{len(texts)} cues already translated")
+
+        if self.memory:
+            missing = [position for position, translation in enumerate(translations) if translation is None]
+            hits = await self.memory.lookup([texts[position] for position in missing])
+            for index, entry in hits.items():
+                translations[missing[index]] = entry.translated_text
+                self.cache_hits += 1
+                self.tokens_saved += entry.token_count
+            logger.info(f"Translation memory: {self.cache_hits}/{len(texts)} cues cached, "
+                        f"~{self.tokens_saved} tokens saved")
+
+        # Identical cues are translated once and the result fanned out to every copy
+        units = {}
+        for position, translation in enumerate(translations):
+            if translation is None:
+                units.setdefault(normalize_text(texts[position]), []).append(position)
+        pending = [positions[0] for positions in units.values()]
+        self.duplicate_cues += sum(len(positions) - 1 for positions in units.values())
+        logger.info(f"Deduplication: {len(pending)} unique units for {sum(map(len, units.values()))} cues")
+        batches = [
+            [pending[i] for i in batch]
+            for batch in pack_batches([texts[position] for position in pending], self.token_budget,
+                                      self.batch_size, self.max_batch_chars, self.delimiter)
+        ]
+        self.batch_count += len(batches)
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        finished_cues = self.resumed_cues
+        total_cues = self.resumed_cues + len(pending)
+        initial_progress = (finished_cues / total_cues) * 100 if total_cues else 0
+        reported = int(initial_progress)
+
+        async def advance(cues):
+            nonlocal finished_cues, reported
+            finished_cues += cues
+            progress = (finished_cues / total_cues) * 100
+            # Only report whole-percent steps so streamed cues don't flood the callback
+            if progress_callback and int(progress) > reported:
+                reported = int(progress)
+                await progress_callback(progress)
+
+        async def translate_positions(batch, on_cue=None):
+            batch_texts = [texts[position] for position in batch]
+            spent = {}
+            results, token_counts = await self.translate_aligned(batch_texts, on_cue=on_cue, spent=spent)
+            for position, translation in zip(batch, results):
+                translations[position] = translation
+            if self.memory:
+                await self.memory.store(list(zip(batch_texts, results, token_counts)))
+            if self.checkpoint:
+                # Save every copy of each unit so a resumed run doesn't send duplicates again
+                finished = {
+                    copy: translation
+                    for position, translation in zip(batch, results) if translation.strip()
+                    for copy in units[normalize_text(texts[position])]
+                }
+                await self.checkpoint.save(finished, spent)
+
+        async def run_batch(batch):
+            async with semaphore:
+                streamed = 0
+
+                async def on_cue():
+                    nonlocal streamed
+                    if streamed < len(batch):
+                        streamed += 1
+                        await advance(1)
+
+                await translate_positions(batch, on_cue=on_cue)
+                await advance(len(batch) - streamed)
+
+        async def run_repair(batch):
+            async with semaphore:
+                await translate_positions(batch)
+
+        async def run_all(runner, batches):
+            tasks = [asyncio.create_task(runner(batch)) for batch in batches]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    await task
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        if progress_callback:
+            await progress_callback(initial_progress)
+        await run_all(run_batch, batches)
+        if progress_callback and not batches:
+            await progress_callback(100)
+
+        # Repair pass: retranslate only the cues that came back empty
+        empty = [position for position in pending if not translations[position].strip() and texts[position].strip()]
+        if empty:
+            logger.info(f"Retranslating {len(empty)} empty cues")
+            repair_batches = [
+                [empty[i] for i in batch]
+                for batch in pack_batches([texts[position] for position in empty], self.token_budget,
+                                          self.batch_size, self.max_batch_chars, self.delimiter)
+            ]
+            self.batch_count += len(repair_batches)
+            await run_all(run_repair, repair_batches)
+            self.repaired_cues = sum(1 for position in empty if translations[position].strip())
+            logger.info(f"Repaired {self.repaired_cues}/{len(empty)} empty cues")
+
+        for positions in units.values():
+            for duplicate in positions[1:]:
+                translations[duplicate] = translations[positions[0]]
+
         translated_subtitles = []
-        batch_texts = []
-        batches_subs = []
-        total_batches = (len(subtitles) + self.batch_size - 1) // self.batch_size
-        await progress_callback(0)
-        for i, subtitle in enumerate(subtitles):
-            batch_texts.append(subtitle.content.replace('‫', ''))
-            batches_subs.append(subtitle)
-
-            if len(batch_texts) == self.batch_size or i == len(subtitles) - 1:
-                translations = await self.translate_batch(batch_texts)
-                
-                for parent_sub, translation in zip(batches_subs, translations):
-                    content = "\u202b" + translation.strip() + "\u202c"
-                    translated_sub = srt.Subtitle(
-                        index=parent_sub.index,
-                        content=content,
-                        start=parent_sub.start,
-                        end=parent_sub.end
-                    )
-                    translated_subtitles.append(translated_sub)
-                
-                # Calculate and report progress
-                current_batch = (i + 1) // self.batch_size
-                progress = (current_batch / total_batches) * 100
-                if progress_callback:
-                    await progress_callback(progress)
-                
-                batch_texts = []
-                batches_subs = []
-        self.total_words = count_words_in_srt(self.compose_srt(translated_subtitles))
+        self.total_words = 0
+        for parent_sub, translation in zip(subtitles, translations):
+            if translation is None:
+                continue
+            translation = translation.strip()
+            self.total_words += len(WORDS.findall(translation))
+            translated_sub = srt.Subtitle(
+                index=parent_sub.index,
+                content="\u202b" + translation + "\u202c",
+                start=parent_sub.start,
+                end=parent_sub.end
+            )
+            translated_subtitles.append(translated_sub)
+
         self.total_lines = len(translated_subtitles)
         if len(translated_subtitles) != len(subtitles):
             logger.error(f"Number of translated subtitles does not match number of original subtitles\nTranslated length: {len(translated_subtitles)}, subtitle length: {len(subtitles)}")
@@ -161,3 +606,11 @@ class SubtitleTranslator:
     def compose_srt(self, translated_subtitles):
         """Convert translated subtitles to string"""
         return srt.compose(translated_subtitles)
+
+    def write_srt(self, translated_subtitles, buffer, encoding='utf-8-sig'):
+        """Compose translated subtitles straight into a binary buffer, cue by cue"""
+        encoder = codecs.getincrementalencoder(encoding)()
+        for subtitle in srt.sort_and_reindex(translated_subtitles, in_place=True):
+            buffer.write(encoder.encode(subtitle.to_srt()))
+        buffer.write(encoder.encode('', final=True))
+        return buffer
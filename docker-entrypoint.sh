@@ -6,7 +6,10 @@
 echo "Running database migrations..."
 alembic upgrade head
 
-# Start the application with uvicorn
-echo "Starting application with uvicorn..."
-uvicorn app:app --host 0.0.0.0 --port 8000 --reload;
-exec "$@"
+# Start the application; exec so uvicorn receives SIGTERM and can drain running jobs
+if [ "$DEV_RELOAD" = "true" ]; then
+    echo "Starting application with uvicorn (reload)..."
+    exec uvicorn app:app --host 0.0.0.0 --port 8000 --reload
+fi
+echo "Starting application..."
+exec python serve.py
@@ -0,0 +1,89 @@
+"""
+Check materialized user balances against the transaction ledger.
+
+Usage:
+    python -m finance.reconcile [--fix]
+
+Logs every user whose ``user_balances`` row differs from the sum of their
+transactions, prints a summary and exits with status 1 if any differ. ``--fix`` rewrites those
+rows from the ledger.
+"""
+import sys
+import asyncio
+import argparse
+from sqlalchemy import select, func
+from models.database import async_session
+from models.models import Transaction, UserBalance
+# logger_config imports the bot package's Telegram log handler; load the package first, as app.py does
+import bot_handler  # noqa: F401
+from logger_config import global_logger
+
+logger = global_logger
+
+# Rials; running sums of floats drift slightly from a fresh SUM
+BALANCE_TOLERANCE = 0.01
+
+
+async def ledger_balance(session, user_id=None):
+    """Return {user_id: incoming - outgoing} computed from transactions"""
+    balances = {}
+    for column, sign in ((Transaction.to_user_id, 1), (Transaction.from_user_id, -1)):
+        query = select(column, func.sum(Transaction.amount)).filter(column.isnot(None)).group_by(column)
+        if user_id is not None:
+            query = query.filter(column == user_id)
+        for owner, total in await session.execute(query):
+            balances[owner] = balances.get(owner, 0) + sign * total
+    return balances
+
+
+async def find_mismatches(tolerance=BALANCE_TOLERANCE):
+    """Return [(user_id, ledger balance, materialized balance)] for users that disagree"""
+    async with async_session() as session:
+        expected = await ledger_balance(session)
+        actual = dict((await session.execute(select(UserBalance.user_id, UserBalance.balance))).all())
+    mismatches = []
+    for user_id in sorted(set(expected) | set(actual)):
+        ledger, materialized = expected.get(user_id, 0), actual.get(user_id)
+        if materialized is None or abs(ledger - materialized) > tolerance:
+            mismatches.append((user_id, ledger, materialized))
+    return mismatches
+
+
+async def repair(user_id):
+    """Rewrite one user's balance from the ledger, locking the row against concurrent charges"""
+    async with async_session() as session:
+        async with session.begin():
+            query = select(UserBalance).filter(UserBalance.user_id == user_id)
+            if session.bind.dialect.name == "postgresql":
+                query = query.with_for_update()
+            row = (await session.execute(query)).scalar_one_or_none()
+            balance = (await ledger_balance(session, user_id)).get(user_id, 0)
+            if row is None:
+                session.add(UserBalance(user_id=user_id, balance=balance))
+            else:
+                row.balance = balance
+    return balance
+
+
+async def reconcile(fix=False):
+    mismatches = await find_mismatches()
+    for user_id, ledger, materialized in mismatches:
+        shown = "missing" if materialized is None else f"{materialized:,.2f}"
+        logger.warning(f"Balance mismatch for user {user_id}: ledger {ledger:,.2f}, materialized {shown}")
+        if fix:
+            balance = await repair(user_id)
+            logger.warning(f"Repaired balance of user {user_id} to {balance:,.2f} (was {materialized})")
+    print(f"{len(mismatches)} mismatched balances" + (" repaired" if fix and mismatches else ""))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check user balances against the transaction ledger")
+    parser.add_argument("--fix", action="store_true", help="rewrite mismatched balances from the ledger")
+    args = parser.parse_args()
+    mismatches = asyncio.run(reconcile(args.fix))
+    sys.exit(1 if mismatches and not args.fix else 0)
+
+
+if __name__ == "__main__":
+    main()
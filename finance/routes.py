@@ -123,13 +123,12 @@ async def confirm_payment(
         receipt.status = PaymentStatus.SUCCESS
         
         # Create transaction
-        transaction = Transaction(
+        transaction = await Transaction.record(
+            db,
+            receipt.amount,
             to_user_id=receipt.user_id,
-            amount=receipt.amount,
             description=f"Payment from gateway: {receipt.tracker_id}"
         )
-        db.add(transaction)
-        await db.flush()
         
         # Link transaction to receipt
         receipt_transaction = ReceiptTransaction(
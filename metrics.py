@@ -0,0 +1,181 @@
+import math
+from bisect import bisect_left
+
+# Latency buckets in seconds
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DIFY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    """
+    A metric family with optional labels.
+
+    Metrics are only recorded from the event loop, so values are plain
+    attributes with no locking. Labelled children are created on first use
+    and cached; hot paths keep a reference to the child they record to.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._default = self.labels()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        return _Value()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+                   for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{self._label_text(values)} {_format(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1):
+        self._default.value += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value):
+        self._default.value = value
+
+    def inc(self, amount=1):
+        self._default.value += amount
+
+    def dec(self, amount=1):
+        self._default.value -= amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=FAST_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), child.counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._label_text(values, [('le', _format(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(values)} {_format(child.sum)}")
+            lines.append(f"{self.name}_count{self._label_text(values)} {child.count}")
+        return lines
+
+
+def _format(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def add_collector(self, collector):
+        """Register an async callable that refreshes gauges just before each scrape"""
+        self._collectors.append(collector)
+
+    async def render(self):
+        for collector in self._collectors:
+            await collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+WEBHOOK_LATENCY = Histogram("motarjem_webhook_request_seconds", "Time to handle one Telegram webhook request")
+WEBHOOK_DUPLICATES = Counter("motarjem_webhook_duplicate_updates_total", "Redelivered updates dropped by update_id")
+UPDATES_PENDING = Gauge("motarjem_updates_pending", "Accepted webhook updates not yet handled")
+BOT_USER_CACHE = Counter("motarjem_bot_user_cache_total", "Bot user identity cache lookups by result", ["result"])
+HANDLER_LATENCY = Histogram("motarjem_handler_seconds", "Time spent in each bot update handler", ["handler"])
+DIFY_BATCH_LATENCY = Histogram("motarjem_dify_batch_seconds", "Latency of one Dify translation request",
+                               ["mode"], buckets=DIFY_BUCKETS)
+DIFY_REQUESTS = Counter("motarjem_dify_requests_total", "Dify translation requests by outcome", ["outcome"])
+DIFY_REQUEST_RETRIES = Counter("motarjem_dify_retries_total", "Dify requests retried after a failure")
+DIFY_BATCH_FAILURES = Counter("motarjem_dify_batch_failures_total", "Batches given up on after all retries")
+DIFY_TOKENS = Counter("motarjem_dify_tokens_total", "Tokens billed by Dify")
+DIFY_COST = Counter("motarjem_dify_cost_dollars_total", "Dollar cost billed by Dify")
+TRANSLATION_JOBS = Gauge("motarjem_translation_jobs", "Translation jobs in the queue by status", ["status"])
+TRANSLATIONS_IN_PROGRESS = Gauge("motarjem_translations_in_progress", "Translations running in this process")
+TRANSLATION_JOBS_FINISHED = Counter("motarjem_translation_jobs_finished_total",
+                                    "Translation jobs finished by this process by outcome", ["outcome"])
+DB_POOL_CHECKOUT = Histogram("motarjem_db_pool_checkout_seconds", "Time waited for a database connection")
+DB_POOL_TIMEOUTS = Counter("motarjem_db_pool_timeouts_total", "Connection checkouts that gave up waiting on the pool")
+DB_POOL_CONNECTIONS = Gauge("motarjem_db_pool_connections", "Database connections held by the pool by state", ["state"])
+DB_POOL_CAPACITY = Gauge("motarjem_db_pool_capacity", "Most connections the pool may open, including overflow")
@@ -1,8 +1,13 @@
 import os
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from metrics import REGISTRY, DB_POOL_CHECKOUT, DB_POOL_TIMEOUTS, DB_POOL_CONNECTIONS, DB_POOL_CAPACITY
 
 # Load environment variables
 load_dotenv()
@@ -16,12 +21,100 @@ if LOCAL_DB and not DATABASE_URL.startswith("sqlite+aiosqlite://"):
     DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://")
 print('Database URL: ', DATABASE_URL)
 print('LOCAL_DB: ', os.getenv("LOCAL_DB", "false"))
+
+# Pool settings per deployment role; worker.py selects "worker" unless DB_PROFILE is set
+ENGINE_PROFILES = {
+    # One process, a few concurrent jobs; SQLite allows a single writer anyway
+    "dev-sqlite": {"pool_size": 5, "max_overflow": 0, "pool_timeout": 30, "pool_recycle": -1,
+                   "pool_pre_ping": False, "statement_cache_size": 0},
+    # Webhook: short handlers, many at once; fail fast rather than queue behind a stuck pool
+    "prod-postgres": {"pool_size": 10, "max_overflow": 10, "pool_timeout": 10, "pool_recycle": 1800,
+                      "pool_pre_ping": True, "statement_cache_size": 500},
+    # Translation workers: few long jobs that write checkpoints and heartbeats
+    "worker": {"pool_size": 4, "max_overflow": 4, "pool_timeout": 30, "pool_recycle": 1800,
+               "pool_pre_ping": True, "statement_cache_size": 500},
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "dev-sqlite" if LOCAL_DB else "prod-postgres")
+if DB_PROFILE not in ENGINE_PROFILES:
+    raise ValueError(f"Unknown DB_PROFILE {DB_PROFILE!r}; expected one of {', '.join(ENGINE_PROFILES)}")
+# Any profile setting can be overridden from the environment
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", ENGINE_PROFILES[DB_PROFILE]["pool_size"]))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", ENGINE_PROFILES[DB_PROFILE]["max_overflow"]))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", ENGINE_PROFILES[DB_PROFILE]["pool_timeout"]))
+# Seconds before a connection is replaced; -1 keeps connections forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", ENGINE_PROFILES[DB_PROFILE]["pool_recycle"]))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", str(ENGINE_PROFILES[DB_PROFILE]["pool_pre_ping"])).lower() == "true"
+# asyncpg prepared statements cached per connection; set 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", ENGINE_PROFILES[DB_PROFILE]["statement_cache_size"]))
+# SQLite: WAL lets readers run alongside the writer; busy timeout waits for a lock instead of failing
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 30))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waits, and checkouts that time out"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT.observe(time.perf_counter() - started)
+
+
+def engine_options(url, profile=DB_PROFILE):
+    """Keyword arguments for create_async_engine for ``url`` under ``profile``"""
+    options = {"echo": False, "pool_pre_ping": DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT}
+        if ":memory:" in url or url.rstrip("/").endswith(":"):
+            # In-memory databases use a single static connection
+            return options
+    elif url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {"application_name": f"motarjem-{profile}"},
+        }
+    options.update(poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                   pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    return options
+
+
+def configure_sqlite(sync_engine):
+    """Apply the journal mode and busy timeout to every new SQLite connection"""
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+        if SQLITE_JOURNAL_MODE.upper() == "WAL":
+            # Durable at checkpoints, and far fewer fsyncs per commit
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
 # Create async SQLAlchemy engine
-engine = create_async_engine(
-    str(DATABASE_URL),
-    echo=False,
-    connect_args={"check_same_thread": False} if LOCAL_DB else {}
-)
+engine = create_async_engine(str(DATABASE_URL), **engine_options(str(DATABASE_URL)))
+if engine.dialect.name == "sqlite":
+    configure_sqlite(engine.sync_engine)
+print(f'Database profile: {DB_PROFILE}')
+
+
+async def collect_pool_metrics():
+    """Refresh the pool saturation gauges before a scrape"""
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return
+    DB_POOL_CONNECTIONS.labels("in_use").set(pool.checkedout())
+    DB_POOL_CONNECTIONS.labels("idle").set(pool.checkedin())
+    DB_POOL_CAPACITY.set(pool.size() + max(DB_MAX_OVERFLOW, 0))
+
+
+REGISTRY.add_collector(collect_pool_metrics)
 
 # Create async session factory
 async_session = sessionmaker(
@@ -1,6 +1,6 @@
-from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Boolean, Enum, Double
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Boolean, Enum, Double, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import JSON
-from sqlalchemy.sql import func, select
+from sqlalchemy.sql import func, select, update, or_
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.asyncio import AsyncSession
 from .database import Base
@@ -17,6 +17,12 @@ class FileStatus(enum.Enum):
     FAILED = "failed"
     COMPLETED = "completed"
 
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
 class PaymentMethod(enum.Enum):
     ONLINE = "online"
     CART2CART = "cart2cart"
@@ -67,22 +73,9 @@ class User(Base):
         return user
 
     async def get_balance(self, db: AsyncSession) -> float:
-        """Calculate user's balance based on incoming and outgoing transactions"""
-        # Get incoming transactions
-        incoming_result = await db.execute(
-            select(func.coalesce(func.sum(Transaction.amount), 0))
-            .filter(Transaction.to_user_id == self.id)
-        )
-        incoming_sum = incoming_result.scalar_one()
-
-        # Get outgoing transactions
-        outgoing_result = await db.execute(
-            select(func.coalesce(func.sum(Transaction.amount), 0))
-            .filter(Transaction.from_user_id == self.id)
-        )
-        outgoing_sum = outgoing_result.scalar_one()
-
-        return incoming_sum - outgoing_sum
+        """User's balance in Rials, read from the materialized running balance"""
+        balance = await db.get(UserBalance, self.id)
+        return balance.balance if balance else 0
 
 class BotUser(Base):
     __tablename__ = "bot_users"
@@ -97,7 +90,7 @@ class BotUser(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Foreign key to User
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
     user = relationship("User", back_populates="bot_user")
 
     @staticmethod
@@ -129,6 +122,9 @@ class BotUser(Base):
 
 class FileTranslation(Base):
     __tablename__ = "file_translations"
+    __table_args__ = (
+        Index("ix_file_translations_user_id_status", "user_id", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     input_file_id = Column(String)
@@ -141,6 +137,15 @@ class FileTranslation(Base):
     total_token_used = Column(Integer, nullable=True)
     total_cost = Column(Double, nullable=True)  # Store cost in Dollar
     message_id = Column(BigInteger, nullable=True)
+    cache_hits = Column(Integer, nullable=True)  # Cues served from translation memory
+    tokens_saved = Column(Integer, nullable=True)  # Estimated tokens saved by translation memory
+    duplicate_cues = Column(Integer, nullable=True)  # Cues that reused the translation of an identical cue
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the normalized SRT content
+    file_unique_id = Column(String, nullable=True, index=True)  # Telegram's stable id for the uploaded file
+    reused_from_id = Column(Integer, ForeignKey("file_translations.id"), nullable=True)
+    input_artifact = Column(String(64), nullable=True)  # Artifact store key of the uploaded SRT
+    output_artifact = Column(String(64), nullable=True)  # Artifact store key of the translated SRT
+    estimated_tokens = Column(Integer, nullable=True)  # Prompt token estimate, used to schedule the job
     
     # Foreign key to User
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -154,7 +159,11 @@ class FileTranslation(Base):
             total_lines: int,
             price_unit: int = 200,
             file_name: str = None,
-            message_id: int = None
+            message_id: int = None,
+            content_hash: str = None,
+            file_unique_id: str = None,
+            input_artifact: str = None,
+            estimated_tokens: int = None
         ):
         """Create a new file translation record"""
         file_translation = FileTranslation(
@@ -164,7 +173,11 @@ class FileTranslation(Base):
             price_unit=price_unit,
             status=FileStatus.INIT,
             file_name=file_name,
-            message_id=message_id
+            message_id=message_id,
+            content_hash=content_hash,
+            file_unique_id=file_unique_id,
+            input_artifact=input_artifact,
+            estimated_tokens=estimated_tokens
         )
         
         db.add(file_translation)
@@ -172,8 +185,104 @@ class FileTranslation(Base):
         
         return file_translation
 
+    @staticmethod
+    async def find_reusable(db: AsyncSession, content_hash: str = None, file_unique_id: str = None, exclude_id: int = None):
+        """Find the latest completed translation of the same content"""
+        conditions = []
+        if content_hash:
+            conditions.append(FileTranslation.content_hash == content_hash)
+        if file_unique_id:
+            conditions.append(FileTranslation.file_unique_id == file_unique_id)
+        if not conditions:
+            return None
+
+        query = (
+            select(FileTranslation)
+            .filter(or_(*conditions))
+            .filter(FileTranslation.status == FileStatus.COMPLETED)
+            .filter(FileTranslation.output_file_id.isnot(None))
+        )
+        if exclude_id is not None:
+            query = query.filter(FileTranslation.id != exclude_id)
+        result = await db.execute(query.order_by(FileTranslation.created_at.desc()).limit(1))
+        return result.scalars().first()
+
+class TranslationJob(Base):
+    """A queued translation, claimed by one worker at a time through a lease"""
+    __tablename__ = "translation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_translation_id = Column(Integer, ForeignKey("file_translations.id"), nullable=False, index=True)
+    chat_id = Column(BigInteger, nullable=False)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, index=True)
+    attempts = Column(Integer, default=0)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    lease_version = Column(Integer, default=0)  # Bumped on every claim so racing claims can be detected
+    last_error = Column(String, nullable=True)
+    progress_message_id = Column(BigInteger, nullable=True)  # The "starting translation" message shown while queued
+    started_at = Column(DateTime(timezone=True), nullable=True)  # When the last claim started running it
+    # Seconds spent in each stage of the last run
+    queue_wait_seconds = Column(Double, nullable=True)
+    download_seconds = Column(Double, nullable=True)
+    parse_seconds = Column(Double, nullable=True)
+    translate_seconds = Column(Double, nullable=True)
+    compose_seconds = Column(Double, nullable=True)
+    upload_seconds = Column(Double, nullable=True)
+    ledger_seconds = Column(Double, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    file_translation = relationship("FileTranslation")
+
+    @staticmethod
+    async def enqueue(db: AsyncSession, file_translation_id: int, chat_id: int):
+        """Queue a translation unless one is already queued or running for the file"""
+        result = await db.execute(
+            select(TranslationJob)
+            .filter(TranslationJob.file_translation_id == file_translation_id)
+            .filter(TranslationJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+        )
+        job = result.scalars().first()
+        if job:
+            return job
+
+        job = TranslationJob(
+            file_translation_id=file_translation_id,
+            chat_id=chat_id,
+            status=JobStatus.QUEUED,
+            attempts=0,
+            lease_version=0
+        )
+        db.add(job)
+        await db.flush()
+        return job
+
+class TranslationMemory(Base):
+    """Previously translated cue text, keyed by normalized source text"""
+    __tablename__ = "translation_memory"
+    __table_args__ = (
+        UniqueConstraint("source_hash", "target_language", "model_version", name="uq_translation_memory_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_hash = Column(String(64), nullable=False)  # sha256 of the normalized source text
+    target_language = Column(String, nullable=False)
+    model_version = Column(String, nullable=False)
+    source_text = Column(String, nullable=False)
+    translated_text = Column(String, nullable=False)
+    token_count = Column(Integer, default=0)  # Estimated tokens spent on this entry
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    # Partial indexes on each side of a transfer; amount is included so per-user sums read only the index
+    __table_args__ = (
+        Index("ix_transactions_from_user_id_amount", "from_user_id", "amount",
+              postgresql_where=text("from_user_id IS NOT NULL"), sqlite_where=text("from_user_id IS NOT NULL")),
+        Index("ix_transactions_to_user_id_amount", "to_user_id", "amount",
+              postgresql_where=text("to_user_id IS NOT NULL"), sqlite_where=text("to_user_id IS NOT NULL")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     from_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -182,12 +291,65 @@ class Transaction(Base):
     description = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    @staticmethod
+    async def record(db: AsyncSession, amount: float, from_user_id: int = None, to_user_id: int = None,
+                     description: str = None):
+        """Add a transaction and move its amount between the users' balances in the same DB transaction"""
+        transaction = Transaction(
+            from_user_id=from_user_id,
+            to_user_id=to_user_id,
+            amount=amount,
+            description=description
+        )
+        db.add(transaction)
+        await db.flush()
+        if to_user_id is not None:
+            await adjust_balance(db, to_user_id, amount)
+        if from_user_id is not None:
+            await adjust_balance(db, from_user_id, -amount)
+        return transaction
+
     # Relationships
     from_user = relationship("User", foreign_keys=[from_user_id])
     to_user = relationship("User", foreign_keys=[to_user_id])
     invoice = relationship("Invoice", back_populates="transactions", secondary="invoice_transactions")
     receipt = relationship("Receipt", back_populates="transactions", secondary="receipt_transactions")
 
+class UserBalance(Base):
+    """Running balance of one user in Rials, kept in step with transactions by Transaction.record"""
+    __tablename__ = "user_balances"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    balance = Column(Double, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+async def adjust_balance(db: AsyncSession, user_id: int, delta: float) -> None:
+    """Add ``delta`` to a user's running balance, creating the row on first use"""
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        # A single atomic upsert, so concurrent charges never lose an update
+        statement = insert(UserBalance).values(user_id=user_id, balance=delta)
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserBalance.user_id],
+            set_={"balance": UserBalance.balance + delta, "updated_at": func.now()}
+        )
+        await db.execute(statement)
+        return
+
+    result = await db.execute(
+        update(UserBalance)
+        .where(UserBalance.user_id == user_id)
+        .values(balance=UserBalance.balance + delta)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(UserBalance(user_id=user_id, balance=delta))
+        await db.flush()
+
 class Invoice(Base):
     __tablename__ = "invoices"
 
@@ -210,7 +372,7 @@ class Receipt(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     amount = Column(Double, nullable=False)
     description = Column(String, nullable=True)
-    tracker_id = Column(String, nullable=True)
+    tracker_id = Column(String, nullable=True, index=True)  # Gateway trackId, looked up by the payment callback
     bank = Column(String, nullable=True)
     status = Column(Enum(PaymentStatus), default=PaymentStatus.INIT)
     method = Column(Enum(PaymentMethod), default=PaymentMethod.ONLINE)
@@ -245,6 +407,34 @@ class JSONString(TypeDecorator):
             return json.loads(value)
         return None
 
+class TranslationCheckpoint(Base):
+    """Translations of one finished batch, saved so an interrupted job can resume"""
+    __tablename__ = "translation_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_translation_id = Column(Integer, ForeignKey("file_translations.id"), nullable=False, index=True)
+    translations = Column(JSONString, nullable=False)  # {cue position: translated text}
+    total_tokens = Column(Integer, default=0)
+    total_price = Column(Double, default=0)  # Store cost in Dollar
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class TranslationBatch(Base):
+    """Usage of one batch sent to Dify, including its retries"""
+    __tablename__ = "translation_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_translation_id = Column(Integer, ForeignKey("file_translations.id"), nullable=False, index=True)
+    job_id = Column(Integer, ForeignKey("translation_jobs.id"), nullable=True, index=True)
+    cues = Column(Integer, nullable=False)
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    total_tokens = Column(Integer, nullable=True)
+    price = Column(Double, nullable=True)  # Store cost in Dollar
+    latency = Column(Double, nullable=True)  # Seconds of the last request
+    retries = Column(Integer, default=0)
+    failed = Column(Boolean, default=False)  # Given up on; its cues were left untranslated
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 # Association tables for many-to-many relationships
 class InvoiceTransaction(Base):
     __tablename__ = "invoice_transactions"
@@ -263,21 +453,12 @@ class ReceiptTransaction(Base):
 from models.database import async_session
 
 async def get_user_balance(user_id: int) -> float:
+    """User's balance in Tomans; a primary-key lookup of the running balance"""
     async with async_session() as db:
-        incoming_result = await db.execute(
-            select(func.coalesce(func.sum(Transaction.amount), 0))
-            .filter(Transaction.to_user_id == user_id)
+        balance = await db.execute(
+            select(UserBalance.balance).filter(UserBalance.user_id == user_id)
         )
-        incoming_sum = incoming_result.scalar()
-
-        # Get outgoing transactions sum
-        outgoing_result = await db.execute(
-            select(func.coalesce(func.sum(Transaction.amount), 0))
-            .filter(Transaction.from_user_id == user_id)
-        )
-        outgoing_sum = outgoing_result.scalar()
-        balance = incoming_sum - outgoing_sum
-        return balance / 10
+        return (balance.scalar() or 0) / 10
 
 async def init_user_charge(user_id: int, amount_toman: int, db) -> None:
     """Initialize user's account with given amount in Tomans"""
@@ -285,13 +466,12 @@ async def init_user_charge(user_id: int, amount_toman: int, db) -> None:
     amount_rial = amount_toman * 10
     
     # Create initial charge transaction
-    initial_charge = Transaction(
+    initial_charge = await Transaction.record(
+        db,
+        amount_rial,
         to_user_id=user_id,
-        amount=amount_rial,
         description=f"Initial welcome bonus: {amount_toman:,} Tomans"
     )
-    db.add(initial_charge)
-    await db.flush()
     
     # Create welcome invoice
     welcome_invoice = Invoice(
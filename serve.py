@@ -0,0 +1,55 @@
+"""
+Production entrypoint for the webhook server.
+
+Usage:
+    python serve.py
+
+Runs uvicorn in a single process with no code reloading. uvloop and
+httptools are used when installed. On SIGTERM the process stops taking
+updates and drains its translation jobs (see ``app.lifespan``) before
+exiting.
+
+The webhook must run as one process: per-chat ordering, update dedup and
+the ``/metrics`` registry live in process memory. Scale translation with
+``worker.py`` instead.
+"""
+import os
+import importlib.util
+import uvicorn
+from dotenv import load_dotenv
+
+env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(env_path)
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+# Webhook processes; only 1 is supported (see the module docstring)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+# auto, uvloop or asyncio
+SERVE_LOOP = os.getenv("SERVE_LOOP", "auto")
+# auto, httptools or h11
+SERVE_HTTP = os.getenv("SERVE_HTTP", "auto")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    if WEB_CONCURRENCY != 1:
+        raise SystemExit(f"WEB_CONCURRENCY={WEB_CONCURRENCY} is not supported: the webhook keeps per-chat order, "
+                         f"update dedup and metrics in one process. Scale translation with worker.py instead.")
+    loop = SERVE_LOOP
+    if loop == "auto":
+        loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = SERVE_HTTP
+    if http == "auto":
+        http = "httptools" if _installed("httptools") else "h11"
+    print(f"Serving on {HOST}:{PORT} ({loop}, {http})")
+    uvicorn.run("app:app", host=HOST, port=PORT, loop=loop, http=http,
+                log_level=LOG_LEVEL, proxy_headers=True, forwarded_allow_ips="*")
+
+
+if __name__ == "__main__":
+    main()
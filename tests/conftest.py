@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# The app builds its database engine and log handlers on import; point them at a scratch SQLite file
+os.environ["LOCAL_DB"] = "true"
+_scratch = tempfile.mkdtemp()
+os.environ["SQLITE_URL"] = f"sqlite+aiosqlite:///{_scratch}/test.db"
+os.environ["ARTIFACT_DIR"] = os.path.join(_scratch, "artifacts")
+os.environ.pop("TELEGRAM_TOKEN", None)
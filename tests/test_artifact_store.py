@@ -0,0 +1,34 @@
+import os
+from bot_handler.artifact_store import ArtifactStore
+
+
+def _stored(root):
+    return sorted(name for _, _, names in os.walk(root) for name in names if name.endswith(".gz"))
+
+
+def test_eviction_counts_artifacts_written_by_other_processes(tmp_path):
+    # Two stores on one directory stand in for the webhook and worker.py
+    webhook = ArtifactStore(root=str(tmp_path), max_bytes=10 ** 9, evict_interval=0)
+    worker = ArtifactStore(root=str(tmp_path), max_bytes=10 ** 9, evict_interval=0)
+    first = webhook.put_sync(os.urandom(4096))
+    os.utime(webhook._path(first), (1, 1))
+    size = os.path.getsize(webhook._path(first))
+
+    worker.max_bytes = size + size // 2
+    second = worker.put_sync(os.urandom(4096))
+
+    assert webhook.get_sync(first) is None
+    assert worker.get_sync(second) is not None
+
+
+def test_eviction_scans_at_most_once_per_interval(tmp_path):
+    store = ArtifactStore(root=str(tmp_path), max_bytes=0, evict_interval=3600)
+    scans = []
+    scan = store._scan
+    store._scan = lambda: scans.append(1) or scan()
+
+    store.put_sync(b"first")
+    store.put_sync(b"second")
+
+    assert len(scans) == 1
+    assert len(_stored(tmp_path)) == 1
@@ -0,0 +1,89 @@
+import asyncio
+from sqlalchemy import select
+from models.database import engine, async_session, Base
+from models.models import User, FileTranslation, FileStatus, Transaction
+from bot_handler.artifact_store import get_artifact_store
+from bot_handler.handlers import process_translation, TRANSLATION_REUSE_PRICE_FACTOR
+
+
+class FailingDownloadBot:
+    def __init__(self):
+        self.messages = []
+
+    async def get_file(self, file_id):
+        raise RuntimeError("telegram is down")
+
+    async def send_message(self, **kwargs):
+        self.messages.append(kwargs)
+
+
+def test_failure_before_progress_message_marks_file_failed():
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_session() as session:
+            user = User(username="download-failure", first_name="Download")
+            session.add(user)
+            await session.flush()
+            file = FileTranslation(user_id=user.id, input_file_id="missing", total_lines=1, price_unit=15,
+                                   status=FileStatus.INIT)
+            session.add(file)
+            await session.commit()
+            file_id = file.id
+
+        bot = FailingDownloadBot()
+        await process_translation(bot, chat_id=1, file_id=file_id)
+
+        async with async_session() as session:
+            assert (await session.get(FileTranslation, file_id)).status == FileStatus.FAILED
+        assert [message["chat_id"] for message in bot.messages] == [1]
+        assert "telegram is down" in bot.messages[0]["text"]
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+class ReuseBot:
+    def __init__(self):
+        self.documents = []
+
+    async def delete_message(self, **kwargs):
+        pass
+
+    async def send_document(self, **kwargs):
+        self.documents.append(kwargs)
+
+
+def test_reused_translation_is_billed_by_its_output_words():
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        store = get_artifact_store()
+        source = b"1\n00:00:01,000 --> 00:00:02,000\nHello there\n"
+        translated = b"1\n00:00:01,000 --> 00:00:02,000\none two three four five\n"
+        async with async_session() as session:
+            user = User(username="reuse-billing", first_name="Reuse")
+            session.add(user)
+            await session.flush()
+            original = FileTranslation(user_id=user.id, input_file_id="in", output_file_id="out", total_lines=1,
+                                       price_unit=15, status=FileStatus.COMPLETED, content_hash="same",
+                                       output_artifact=await store.put(translated))
+            file = FileTranslation(user_id=user.id, input_file_id="in", total_lines=1, price_unit=15,
+                                   status=FileStatus.INIT, content_hash="same", input_artifact=await store.put(source))
+            session.add_all([original, file])
+            await session.commit()
+            file_id, user_id = file.id, user.id
+
+        bot = ReuseBot()
+        await process_translation(bot, chat_id=1, file_id=file_id)
+
+        assert [document["document"] for document in bot.documents] == ["out"]
+        async with async_session() as session:
+            assert (await session.get(FileTranslation, file_id)).status == FileStatus.COMPLETED
+            charged = (await session.execute(
+                select(Transaction.amount).filter(Transaction.from_user_id == user_id))).scalar_one()
+        # Five translated words, not the two of the upload; amounts are stored in Rials
+        assert charged == 5 * 15 * TRANSLATION_REUSE_PRICE_FACTOR * 10
+        await engine.dispose()
+
+    asyncio.run(scenario())
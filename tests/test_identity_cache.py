@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+from sqlalchemy import select
+from models.database import engine, async_session, Base
+from models.models import BotUser
+from bot_handler.auth import authenticate_user
+from bot_handler.identity_cache import get_identity_cache
+
+
+class FakeBot:
+    async def send_message(self, **kwargs):
+        pass
+
+
+@authenticate_user
+async def whoami(update, context, bot_user=None):
+    return bot_user
+
+
+def test_bot_user_update_is_visible_at_once():
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        get_identity_cache().clear()
+        telegram_user = SimpleNamespace(id=4242, username="reviewer", first_name="Old", last_name=None)
+        update = SimpleNamespace(effective_user=telegram_user, message=None)
+        context = SimpleNamespace(bot=FakeBot())
+
+        assert (await whoami(update, context)).first_name == "Old"
+        assert get_identity_cache().get(4242) is not None
+
+        async with async_session() as session:
+            bot_user = (await session.execute(select(BotUser).filter(BotUser.telegram_id == 4242))).scalar_one()
+            bot_user.first_name = "New"
+            await session.commit()
+
+        assert (await whoami(update, context)).first_name == "New"
+        await engine.dispose()
+
+    asyncio.run(scenario())
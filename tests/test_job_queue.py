@@ -0,0 +1,98 @@
+import asyncio
+import datetime
+from sqlalchemy import delete
+from models.database import engine, async_session, Base
+from models.models import User, FileTranslation, FileStatus, TranslationJob, JobStatus
+from bot_handler import job_queue
+from bot_handler.scheduler import utcnow
+
+
+async def add_job(session, name, **job):
+    """A job on its own user's file, so the per-user cap never holds it back"""
+    user = User(username=f"lease-{name}", first_name=name)
+    session.add(user)
+    await session.flush()
+    file = FileTranslation(user_id=user.id, input_file_id=name, total_lines=10, price_unit=15,
+                           status=FileStatus.PROCESSING)
+    session.add(file)
+    await session.flush()
+    translation_job = TranslationJob(file_translation_id=file.id, chat_id=1, **job)
+    session.add(translation_job)
+    await session.flush()
+    return translation_job.id, file.id
+
+
+def test_worker_survives_failing_jobs(monkeypatch):
+    claims = [(1, 101, 1, None), (2, 102, 1, None), (3, 103, 1, None)]
+    finished = []
+
+    async def claim_job(owner):
+        return claims.pop(0) if claims else None
+
+    async def process_translation(bot, chat_id, file_id, progress_message_id, translation_job_id=None):
+        if translation_job_id == 1:
+            # The translation cancels itself; CancelledError is not an Exception
+            asyncio.current_task().cancel()
+            await asyncio.sleep(0)
+
+    async def finish_job(job_id, owner, succeeded, error=None):
+        if job_id == 2:
+            raise RuntimeError("database went away")
+        finished.append((job_id, succeeded, error))
+
+    monkeypatch.setattr(job_queue, "claim_job", claim_job)
+    monkeypatch.setattr(job_queue, "process_translation", process_translation)
+    monkeypatch.setattr(job_queue, "finish_job", finish_job)
+
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        pool = job_queue.TranslationWorkerPool(bot=None, size=1, poll_interval=0.01)
+        pool.start()
+        for _ in range(200):
+            if len(finished) == 2:
+                break
+            await asyncio.sleep(0.01)
+        worker = pool._tasks[0]
+        assert not worker.done()
+        await pool.drain(timeout=1)
+        await engine.dispose()
+
+    asyncio.run(scenario())
+    assert finished == [(1, False, "Translation was cancelled"), (3, False, None)]
+
+
+def test_expired_leases_are_reclaimed_and_live_ones_left_alone():
+    async def scenario():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(delete(TranslationJob))
+        past = utcnow() - datetime.timedelta(minutes=5)
+        future = utcnow() + datetime.timedelta(minutes=5)
+        async with async_session() as session:
+            abandoned, _ = await add_job(session, "abandoned", status=JobStatus.RUNNING, lease_owner="dead",
+                                         lease_expires_at=past, attempts=1, lease_version=3)
+            await add_job(session, "live", status=JobStatus.RUNNING, lease_owner="elsewhere",
+                          lease_expires_at=future, attempts=1, lease_version=1)
+            exhausted, exhausted_file = await add_job(session, "exhausted", status=JobStatus.RUNNING,
+                                                      lease_owner="dead", lease_expires_at=past,
+                                                      attempts=job_queue.JOB_MAX_ATTEMPTS)
+            await session.commit()
+
+        # The abandoned job resumes ahead of the exhausted one, which is given up on at the next claim
+        assert (await job_queue.claim_job("rescuer"))[0] == abandoned
+        assert await job_queue.claim_job("rescuer") is None
+        assert await job_queue.claim_job("rescuer") is None
+
+        # The old owner can no longer finish the job it lost
+        await job_queue.finish_job(abandoned, "dead", succeeded=True)
+
+        async with async_session() as session:
+            job = await session.get(TranslationJob, abandoned)
+            assert (job.status, job.lease_owner, job.attempts, job.lease_version) == \
+                (JobStatus.RUNNING, "rescuer", 2, 4)
+            assert (await session.get(TranslationJob, exhausted)).status == JobStatus.FAILED
+            assert (await session.get(FileTranslation, exhausted_file)).status == FileStatus.FAILED
+        await engine.dispose()
+
+    asyncio.run(scenario())
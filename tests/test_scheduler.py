@@ -0,0 +1,35 @@
+import datetime
+from types import SimpleNamespace
+from models.models import JobStatus
+from bot_handler.scheduler import order_jobs, SJF_AGING_TOKENS_PER_SECOND
+
+NOW = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def row(job_id, user_id, tokens, waited=0, status=JobStatus.QUEUED):
+    job = SimpleNamespace(id=job_id, status=status, created_at=NOW - datetime.timedelta(seconds=waited))
+    return job, user_id, tokens, None
+
+
+def ids(rows):
+    return [job.id for job, _, _, _ in rows]
+
+
+def test_fair_mode_serves_users_with_fewest_running_jobs_first():
+    rows = [row(1, "busy", 100), row(2, "idle", 100), row(3, "busy", 100), row(4, "other", 100)]
+    assert ids(order_jobs(rows, {"busy": 1}, NOW, mode="fair", max_per_user=0)) == [2, 4, 1, 3]
+
+
+def test_users_at_their_cap_are_held_back_but_abandoned_jobs_resume_first():
+    rows = [row(1, "capped", 100), row(2, "free", 100), row(3, "capped", 100, status=JobStatus.RUNNING)]
+    assert ids(order_jobs(rows, {"capped": 1}, NOW, mode="fair", max_per_user=1)) == [3, 2]
+
+
+def test_sjf_mode_runs_small_jobs_first_and_ages_large_ones():
+    rows = [row(1, "a", 5000), row(2, "b", 200), row(3, "c", 1000)]
+    assert ids(order_jobs(rows, {}, NOW, mode="sjf", max_per_user=0)) == [2, 3, 1]
+
+    # Waiting long enough makes the large job count as the smallest
+    waited = (5000 - 100) / SJF_AGING_TOKENS_PER_SECOND + 1
+    rows[0] = row(1, "a", 5000, waited=waited)
+    assert ids(order_jobs(rows, {}, NOW, mode="sjf", max_per_user=0)) == [1, 2, 3]
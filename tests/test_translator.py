@@ -0,0 +1,175 @@
+import asyncio
+import datetime
+import contextlib
+import aiohttp
+import pytest
+import srt
+from aiohttp import web
+import bot_handler.translator as translator_module
+from benchmarks.fake_dify import FakeDify, FakeDifyConfig
+from bot_handler.rate_limiter import DifyRateLimiter
+from bot_handler.retry import CircuitBreaker
+from bot_handler.translator import SubtitleTranslator
+
+
+@pytest.fixture
+def fresh_limits(monkeypatch):
+    """Give each test its own breaker and an unthrottled limiter; the shared ones outlive the test's loop"""
+    breaker = CircuitBreaker()
+    limiter = DifyRateLimiter(max_rps=1000, max_tpm=10 ** 9)
+    monkeypatch.setattr(translator_module, "get_circuit_breaker", lambda: breaker)
+    monkeypatch.setattr(translator_module, "get_rate_limiter", lambda: limiter)
+
+
+@contextlib.asynccontextmanager
+async def fake_dify(**config):
+    """Run benchmarks.fake_dify in the test's loop; yields (server, translator_kwargs)"""
+    fake = FakeDify(FakeDifyConfig(**{"latency": "constant:0", "seed": 0, **config}))
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            yield fake, {"base_url": f"http://127.0.0.1:{port}/v1", "session": session}
+    finally:
+        await runner.cleanup()
+
+
+def subtitles(texts):
+    return [srt.Subtitle(index=i + 1, start=datetime.timedelta(seconds=i), end=datetime.timedelta(seconds=i + 1),
+                         content=text) for i, text in enumerate(texts)]
+
+
+def contents(translated):
+    return [subtitle.content.strip("\u202b\u202c") for subtitle in translated]
+
+
+class ScriptedTranslator(SubtitleTranslator):
+    """Answers from ``answer(texts)`` instead of Dify, recording every batch it is sent"""
+
+    def __init__(self, answer, **kwargs):
+        super().__init__("key", **kwargs)
+        self.answer = answer
+        self.sent = []
+
+    async def _translate_once(self, texts, usage=None, on_cue=None):
+        self.sent.append(list(texts))
+        return self.answer(texts)
+
+
+class BlockingLimiter:
+    """Rate limiter whose acquire never returns, so callers stay queued"""
+
+    def __init__(self):
+        self.waiting = asyncio.Event()
+
+    async def acquire(self, job_id, estimated_tokens, user_id=None):
+        self.waiting.set()
+        await asyncio.Event().wait()
+
+    async def release(self, *args, **kwargs):
+        pass
+
+
+def test_cancel_during_limiter_wait_releases_half_open_trial(monkeypatch):
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        limiter = BlockingLimiter()
+        monkeypatch.setattr(translator_module, "get_circuit_breaker", lambda: breaker)
+        monkeypatch.setattr(translator_module, "get_rate_limiter", lambda: limiter)
+
+        task = asyncio.create_task(SubtitleTranslator("key").translate_batch(["Hello"]))
+        await asyncio.wait_for(limiter.waiting.wait(), timeout=1)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert await asyncio.wait_for(breaker.acquire(), timeout=1) is True
+
+    asyncio.run(scenario())
+
+
+def test_misaligned_batches_are_bisected_down_to_aligned_halves(fresh_limits):
+    async def scenario():
+        texts = [f"line {i}" for i in range(6)]
+        # Every multi-cue answer loses a delimiter, so only single cues come back aligned
+        async with fake_dify(corruption_rate=1.0) as (fake, options):
+            translator = SubtitleTranslator("key", batch_size=10, **options)
+            translated = await translator.translate_all_subtitles(subtitles(texts))
+        assert contents(translated) == [f"ترجمه {text}" for text in texts]
+        assert translator.batch_count == 1
+        assert translator.mismatched_batches == 1
+        assert fake.corrupted > 1
+
+    asyncio.run(scenario())
+
+
+def test_cues_left_empty_are_repaired_once(fresh_limits):
+    async def scenario():
+        attempts = {}
+
+        def answer(texts):
+            results = []
+            for text in texts:
+                attempts[text] = attempts.get(text, 0) + 1
+                results.append("" if text == "flaky" and attempts[text] == 1 else text.upper())
+            return results
+
+        translator = ScriptedTranslator(answer, batch_size=10)
+        translated = await translator.translate_all_subtitles(subtitles(["one", "flaky", "two"]))
+        assert contents(translated) == ["ONE", "FLAKY", "TWO"]
+        assert translator.sent == [["one", "flaky", "two"], ["flaky"]]
+        assert translator.repaired_cues == 1
+
+    asyncio.run(scenario())
+
+
+def test_identical_cues_are_translated_once_and_fanned_out(fresh_limits):
+    async def scenario():
+        texts = ["Hello", "Bye", "Hello", "  Hello ", "\u202bBye", "New"]
+        async with fake_dify() as (fake, options):
+            translator = SubtitleTranslator("key", batch_size=1, **options)
+            translated = await translator.translate_all_subtitles(subtitles(texts))
+        assert contents(translated) == ["ترجمه Hello", "ترجمه Bye", "ترجمه Hello", "ترجمه Hello", "ترجمه Bye",
+                                        "ترجمه New"]
+        assert fake.requests == 3
+        assert translator.duplicate_cues == 3
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_batches_are_reassembled_in_cue_order(fresh_limits):
+    async def scenario():
+        texts = [f"cue {i}" for i in range(24)]
+        # Random latencies make batches finish out of order
+        async with fake_dify(latency="uniform:0,0.05", seed=7) as (fake, options):
+            translator = SubtitleTranslator("key", batch_size=2, concurrency=6, **options)
+            progress = []
+
+            async def on_progress(value):
+                progress.append(value)
+
+            translated = await translator.translate_all_subtitles(subtitles(texts), progress_callback=on_progress)
+        assert contents(translated) == [f"ترجمه {text}" for text in texts]
+        assert [subtitle.index for subtitle in translated] == list(range(1, 25))
+        assert fake.requests == 12
+        assert progress == sorted(progress) and progress[-1] == 100
+
+    asyncio.run(scenario())
+
+
+def test_pack_batches_respects_budget_cue_and_char_limits():
+    delimiter = "[DELIMITER]"
+    separator = translator_module.estimate_tokens(f"\n{delimiter}\n")
+    text = "a" * 40  # 10 tokens
+    per_text = 10 + separator
+
+    assert translator_module.pack_batches([text] * 5, per_text * 2, 10, 10000) == [[0, 1], [2, 3], [4]]
+    assert translator_module.pack_batches([text] * 5, 10 ** 6, 3, 10000) == [[0, 1, 2], [3, 4]]
+    assert translator_module.pack_batches([text] * 3, 10 ** 6, 10, 2 * (40 + len(delimiter) + 2)) == [[0, 1], [2]]
+    # A text over every limit still gets a batch of its own
+    assert translator_module.pack_batches(["short", "b" * 1000, "short"], 50, 10, 100) == [[0], [1], [2]]
+    assert translator_module.pack_batches([], 100, 10, 100) == []
@@ -0,0 +1,69 @@
+import os
+import signal
+import asyncio
+from aiohttp import web
+from telegram import Bot
+from dotenv import load_dotenv
+
+# Load environment variables
+env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+load_dotenv(env_path)
+# Pool sizing for long-running jobs; must be set before the database engine is built
+os.environ.setdefault("DB_PROFILE", "worker")
+
+from bot_handler.http_client import init_http_session, close_http_session
+from bot_handler.job_queue import TranslationWorkerPool, TRANSLATION_WORKERS, collect_job_metrics
+from logger_config import global_logger
+from metrics import REGISTRY, CONTENT_TYPE
+
+logger = global_logger
+
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Port for this worker's Prometheus /metrics endpoint; 0 disables it
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 0))
+
+
+async def serve_metrics(port):
+    """Expose the worker's metrics, which the webhook's /metrics cannot see"""
+    async def metrics(request):
+        return web.Response(body=(await REGISTRY.render()).encode("utf-8"),
+                            headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    logger.info(f"Worker metrics served on port {port}")
+    return runner
+
+
+async def main():
+    """Run translation workers without the webhook, so they can be scaled separately"""
+    bot = Bot(TELEGRAM_TOKEN)
+    await bot.initialize()
+    await init_http_session()
+
+    pool = TranslationWorkerPool(bot, size=max(1, TRANSLATION_WORKERS))
+    pool.start()
+    metrics_runner = None
+    if WORKER_METRICS_PORT:
+        REGISTRY.add_collector(collect_job_metrics)
+        metrics_runner = await serve_metrics(WORKER_METRICS_PORT)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Stopping translation workers")
+    await pool.drain()
+    if metrics_runner:
+        await metrics_runner.cleanup()
+    await close_http_session()
+    await bot.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())